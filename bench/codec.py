@@ -0,0 +1,78 @@
+"""
+Compare the old message serialization (stdlib json, indent=2) with each
+codec backend that's installed, for messages of several sizes. Reports
+per-message dumps and loads time, and the size of the serialized message.
+
+Usage: python bench/codec.py
+"""
+import json
+import os
+import sys
+import timeit
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from q import codec
+
+SIZES = [1024, 16 * 1024, 256 * 1024, 4 * 1024 * 1024]
+
+
+def _message(size):
+    """A DIDComm-like message, with enough nested items to be about size bytes as indented JSON."""
+    msg = {
+        '@type': 'did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/basicmessage/1.0/message',
+        '@id': str(uuid.uuid4()),
+        '~thread': {'thid': str(uuid.uuid4()), 'sender_order': 0},
+        '~timing': {'in_time': '2019-08-01T12:00:00.000000'},
+        'items': [],
+    }
+    item = {'id': 0, 'name': 'item', 'value': 3.14159, 'tags': ['a', 'b', 'c'], 'ok': True}
+    per_item = len(json.dumps({'items': [item]}, indent=2)) - len(json.dumps({'items': []}, indent=2))
+    room = size - len(json.dumps(msg, indent=2))
+    msg['items'] = [dict(item, id=i) for i in range(max(1, room // per_item))]
+    return msg
+
+
+class _Old:
+    name = 'json indent=2 (old)'
+
+    @staticmethod
+    def dumps(obj, pretty):
+        return json.dumps(obj, indent=2)
+
+    loads = staticmethod(json.loads)
+
+
+def _per_call(func):
+    timer = timeit.Timer(func)
+    n, elapsed = timer.autorange()
+    return min([elapsed] + timer.repeat(2, n)) / n
+
+
+def _fmt(seconds):
+    if seconds < 1e-3:
+        return '%7.1f us' % (seconds * 1e6)
+    return '%7.2f ms' % (seconds * 1e3)
+
+
+def main():
+    backends = [_Old()]
+    for name in ['json', 'ujson', 'orjson']:
+        try:
+            backends.append(codec.get_backend(name))
+        except ImportError:
+            pass
+    print('%9s  %-20s %10s %11s %11s' % ('size', 'codec', 'bytes', 'dumps', 'loads'))
+    for size in SIZES:
+        msg = _message(size)
+        for b in backends:
+            txt = b.dumps(msg, False)
+            data = txt.encode('utf-8')
+            print('%9d  %-20s %10d %11s %11s' % (size, b.name, len(data),
+                _fmt(_per_call(lambda: b.dumps(msg, False))), _fmt(_per_call(lambda: b.loads(data)))))
+
+
+if __name__ == '__main__':
+    main()
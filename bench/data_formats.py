@@ -0,0 +1,77 @@
+"""
+Time data_formats.is_likely_json() and is_likely_wire_format(), which run on
+every inbound message, over plaintext, wire-format and garbage inputs from
+1 KB to 10 MB, as both bytes and str. If a git revision is given, the same
+cases also run against that revision's data_formats, for comparison.
+
+Usage: python bench/data_formats.py [git_revision]
+"""
+import os
+import subprocess
+import sys
+import timeit
+import types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from q import data_formats
+
+SIZES = [1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+
+_WIRE_HEAD = '{"protected": "' + 'eyJlbmMiOiJ4Y2hhY2hhMjBwb2x5' * 8 + '", "iv": "ZqOrBZiA-RdFMhy2", "ciphertext": "'
+_WIRE_TAIL = '", "tag": "kAuPl8mwb0FFVyip1omEhQ=="}\n'
+
+
+def _plaintext(size):
+    head = '{"@type": "did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/basicmessage/1.0/message", "content": "'
+    return head + 'x' * (size - len(head) - 3) + '"}\n'
+
+
+def _wire(size):
+    return _WIRE_HEAD + 'K7Kxke' * ((size - len(_WIRE_HEAD) - len(_WIRE_TAIL)) // 6) + _WIRE_TAIL
+
+
+def _garbage(size):
+    return ('\x00\x7f~junk' * (size // 9 + 1))[:size]
+
+
+INPUTS = [('plaintext', _plaintext), ('wire', _wire), ('garbage', _garbage)]
+
+
+def _load_revision(rev):
+    src = subprocess.check_output(['git', 'show', '%s:q/data_formats.py' % rev], cwd=ROOT)
+    module = types.ModuleType('data_formats_' + rev)
+    exec(compile(src, 'data_formats.py@' + rev, 'exec'), module.__dict__)
+    return module
+
+
+def _per_call(func, data):
+    timer = timeit.Timer(lambda: func(data))
+    n, elapsed = timer.autorange()
+    return min([elapsed] + timer.repeat(2, n)) / n
+
+
+def _fmt(seconds):
+    if seconds < 1e-3:
+        return '%7.2f us' % (seconds * 1e6)
+    return '%7.2f ms' % (seconds * 1e3)
+
+
+def main(rev=None):
+    impls = [('current', data_formats)]
+    if rev:
+        impls.append((rev, _load_revision(rev)))
+    print('%-10s %-5s %9s  %-10s %12s %12s' % ('input', 'type', 'size', 'impl', 'json', 'wire'))
+    for name, make in INPUTS:
+        for size in SIZES:
+            text = make(size)
+            for kind, data in [('str', text), ('bytes', text.encode('utf-8'))]:
+                for label, module in impls:
+                    print('%-10s %-5s %9d  %-10s %12s %12s' % (name, kind, size, label,
+                        _fmt(_per_call(module.is_likely_json, data)),
+                        _fmt(_per_call(module.is_likely_wire_format, data))))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,53 @@
+"""
+Measure how long scripts take to start, to see what transport plugin imports
+cost. Each case runs in a fresh interpreter, several times; we report the
+median wall-clock time.
+
+Usage: python bench/startup.py [repetitions]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _time(args, reps):
+    times = []
+    for i in range(reps):
+        start = time.perf_counter()
+        proc = subprocess.run(args, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        times.append(time.perf_counter() - start)
+        if proc.returncode:
+            return None, proc.stderr.decode('utf-8').strip().splitlines()[-1]
+    return statistics.median(times), None
+
+
+def main(reps=20):
+    folder = tempfile.mkdtemp()
+    py = sys.executable
+    cases = [
+        ('bare interpreter', [py, '-c', 'pass']),
+        ('import q.transports', [py, '-c', 'from q import transports']),
+        ('load a folder sender (dcs to a folder)', [py, '-c',
+            'from q import transports; transports.load(%r, transports.SENDERS)' % folder]),
+        ('import every plugin (the old eager behavior)', [py, '-c',
+            'from q import transports\n'
+            'for p in transports.SENDERS + transports.RECEIVERS: p.module']),
+        ('bin/polyrelay.py --help', [py, 'bin/polyrelay.py', '--help']),
+        ('bin/dcs.py --help', [py, 'bin/dcs.py', '--help']),
+    ]
+    for label, args in cases:
+        median, err = _time(args, reps)
+        if median is None:
+            print('%-48s  failed: %s' % (label, err))
+        else:
+            print('%-48s %8.1f ms' % (label, median * 1000))
+    os.rmdir(folder)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
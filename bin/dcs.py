@@ -1,13 +1,21 @@
-import asyncio
 import os
 import sys
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-from q.agents.dcs import main
 
 
 if __name__ == '__main__':
+    argv = sys.argv[1:]
+    if '--serve' not in argv:
+        # If a `dcs --serve` daemon is running, let it do the work; that's
+        # much faster than importing indy and opening the wallet ourselves.
+        from q.agents import dcs_daemon
+        code = dcs_daemon.client_main(argv)
+        if code is not None:
+            sys.exit(code)
+    import asyncio
+    from q.agents.dcs import main
     try:
-        asyncio.run(main())
+        asyncio.run(main(argv))
     except KeyboardInterrupt:
         print('')
@@ -8,6 +8,6 @@ from q.agents.polyrelay import main
 
 if __name__ == '__main__':
     try:
-        asyncio.run(main(sys.argv))
+        asyncio.run(main(sys.argv[1:]))
     except KeyboardInterrupt:
         print('')
\ No newline at end of file
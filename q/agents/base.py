@@ -1,12 +1,12 @@
 import base64
 import inspect
-import json
 import logging
 import os
 import time
 
 import indy
 
+from .. import codec
 from .. import log_helpers
 from ..mtc import *
 from ..dbc import *
@@ -99,7 +99,7 @@ class Agent:
     async def unpack(self, wc):
         # If we have an encrypted message and we haven't already proved to ourselves that it's not decryptable
         if wc.ciphertext and wc.tc.trust_for(CONFIDENTIALITY) != False:
-            unpacked = json.loads(await indy.crypto.unpack_message(self.wallet_handle, wc.ciphertext.encode('utf-8')))
+            unpacked = codec.loads(await indy.crypto.unpack_message(self.wallet_handle, wc.ciphertext.encode('utf-8')))
             wc.plaintext = unpacked.message
             wc.tc.affirm(CONFIDENTIALITY | INTEGRITY)
             if wc.get('sender_verkey', None):
@@ -110,7 +110,7 @@ class Agent:
                 wc.interaction = self.interdb.get_interaction(wc.thid)
 
     async def sign(self, fragment, verkey):
-        txt = json.dumps(fragment, indent=2) if isinstance(fragment, dict) else fragment
+        txt = codec.dumps(fragment) if isinstance(fragment, dict) else fragment
         timestamp = get_timestamp()
         data = [0,0,0,0,0,0,0,0] + txt.encode('utf-8')
         mask = 255
@@ -135,7 +135,7 @@ class Agent:
     @staticmethod
     async def _pack(wallet_handle, msg, sender_key, to):
         if isinstance(msg, dict):
-            msg = json.dumps(msg)
+            msg = codec.dumps(msg)
         elif isinstance(msg, bytes):
             msg = msg.decode('utf-8')
         if not isinstance(to, list):
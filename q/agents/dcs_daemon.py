@@ -0,0 +1,254 @@
+"""
+The command socket that lets a long-running `dcs --serve` do the work of many
+short-lived `dcs` invocations.
+
+Opening the wallet (and importing indy) costs hundreds of milliseconds, so a
+script that sends thousands of messages shouldn't pay it every time. Instead,
+`dcs --serve` opens the wallet once and listens on a unix socket; plain `dcs`
+notices the socket, hands its request over, and exits. Nothing in the client
+half of this module imports indy--or even asyncio--so it starts fast.
+
+The protocol is one JSON object per line. A request looks like
+{"msg": "...", "dest": "...", "sender": "...", "to": ["...", ...],
+"wallet": "...", "phrase_digest": "..."}; the response is {"ok": true} or
+{"ok": false, "error": "..."}. The daemon only acts for clients that name
+the wallet it has open and know its passphrase; when they don't, it says
+so with "wrong_wallet": true, and the client does the work itself.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import re
+import socket
+
+from .. import codec
+
+SOCKET_ENV_VAR = 'DCS_SOCKET'
+DEFAULT_SOCKET = '~/.q/dcs/dcs.sock'
+# What base.Agent uses for dcs, when --folder and --wallet aren't given.
+DEFAULT_FOLDER = '~/.q/dcs'
+DEFAULT_WALLET = 'wallet'
+# Scripts shouldn't hang forever on a wedged daemon.
+DEFAULT_CLIENT_TIMEOUT = 60
+_MAX_LINE = 64 * 1024 * 1024
+# Destinations that start like this are uris, not file system paths.
+_URI_PAT = re.compile('^[a-z][a-z0-9_.]{1,9}:')
+
+
+class DaemonError(Exception):
+    pass
+
+
+class WrongWallet(DaemonError):
+    """The daemon has a different wallet open than the one the client asked for."""
+    pass
+
+
+def wallet_id(folder, wallet):
+    """Identify a wallet by where it lives, however folder is spelled."""
+    return os.path.join(os.path.abspath(os.path.expanduser(folder)), wallet)
+
+
+def phrase_digest(phrase):
+    # Lets the daemon check the client's passphrase without being sent it.
+    return hashlib.sha256((phrase or '').encode('utf-8')).hexdigest()
+
+
+def socket_path(path=None):
+    """Return the path of the daemon's socket: path if given, else $DCS_SOCKET, else the default."""
+    return os.path.expanduser(path or os.environ.get(SOCKET_ENV_VAR) or DEFAULT_SOCKET)
+
+
+def absolute_dest(dest):
+    """
+    Return dest with any file system path made absolute. The daemon has its
+    own working directory (and maybe its own home), so a path relative to
+    ours would mean something else to it.
+    """
+    if dest == 'stdout' or _URI_PAT.match(dest):
+        return dest
+    return os.path.abspath(os.path.expanduser(dest))
+
+
+def socket_in_use(path):
+    """
+    Return True if something is listening on the unix socket at path, and
+    False if the socket is left over from a process that died (or doesn't
+    exist). Raise OSError if we can't tell.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(1)
+        try:
+            s.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+def request(msg, dest, sender, to, path=None, timeout=DEFAULT_CLIENT_TIMEOUT, wallet=None, phrase=None):
+    """
+    Ask the daemon to pack msg for the keys in to, from sender, and send it to
+    dest, using the wallet identified by wallet (see wallet_id()) and unlocked
+    by phrase. Raise ConnectionError (or FileNotFoundError) if no daemon is
+    listening, WrongWallet if it has another wallet open (or phrase is wrong),
+    and DaemonError if it couldn't do what we asked.
+    """
+    req = {'msg': msg, 'dest': absolute_dest(dest), 'sender': sender, 'to': list(to),
+           'wallet': wallet, 'phrase_digest': phrase_digest(phrase)}
+    # One request per line, so never pretty-print.
+    line = codec.dumps(req, pretty=False) + '\n'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path(path))
+        s.sendall(line.encode('utf-8'))
+        with s.makefile('rb') as f:
+            resp = f.readline()
+    if not resp:
+        raise DaemonError('dcs daemon closed the connection without answering.')
+    resp = codec.loads(resp)
+    if not resp.get('ok'):
+        cls = WrongWallet if resp.get('wrong_wallet') else DaemonError
+        raise cls(resp.get('error', 'unknown error'))
+
+
+class _ClientArgParser(argparse.ArgumentParser):
+    def error(self, message):
+        # Let dcs itself report bad command lines.
+        raise ValueError(message)
+
+
+def _client_args(argv):
+    """
+    Parse a dcs command line the way dcs would, so options that take values
+    aren't mistaken for positional args. Raise ValueError if it doesn't parse.
+    """
+    parser = _ClientArgParser(add_help=False)
+    parser.add_argument('msg')
+    parser.add_argument('dest')
+    parser.add_argument('sender')
+    parser.add_argument('to', nargs='+')
+    parser.add_argument('--socket')
+    # The agent options (see base.Agent.configure).
+    parser.add_argument('--phrase')
+    parser.add_argument('--promptphrase', action='store_true')
+    parser.add_argument('--wallet')
+    parser.add_argument('--loglevel')
+    parser.add_argument('--folder')
+    args, extra = parser.parse_known_args(argv)
+    if extra:
+        raise ValueError('unrecognized arguments: %s' % ' '.join(extra))
+    return args
+
+
+def _client_args_path(argv):
+    for i, arg in enumerate(argv):
+        if arg == '--socket' and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith('--socket='):
+            return arg[len('--socket='):]
+
+
+def client_main(argv):
+    """
+    Hand a dcs command line over to a running daemon. Return an exit code, or
+    None if there's no daemon to talk to (or the command isn't a plain send),
+    in which case the caller should do the work itself.
+    """
+    if '-h' in argv or '--help' in argv:
+        return None
+    path = socket_path(_client_args_path(argv))
+    if not os.path.exists(path):
+        return None
+    try:
+        args = _client_args(argv)
+    except ValueError:
+        return None
+    if not os.path.isfile(args.msg):
+        print('Message file %s does not exist or is not readable.' % args.msg)
+        return 1
+    with open(args.msg, 'rb') as f:
+        msg = f.read().decode('utf-8')
+    phrase = args.phrase
+    if args.promptphrase:
+        import getpass
+        phrase = getpass.getpass('Passphrase to unlock wallet: ')
+    wallet = wallet_id(args.folder or DEFAULT_FOLDER, args.wallet or DEFAULT_WALLET)
+    try:
+        request(msg, args.dest, args.sender, args.to, path, wallet=wallet, phrase=phrase)
+    except (ConnectionError, FileNotFoundError):
+        # The daemon went away and left its socket behind.
+        return None
+    except WrongWallet:
+        # Not the wallet the daemon has open; do it the slow way.
+        return None
+    except DaemonError as e:
+        print('dcs daemon: %s' % e)
+        return 1
+    return 0
+
+
+async def serve(path, handler, wallet=None, phrase=None):
+    """
+    Listen on a unix socket at path, and answer each request line by awaiting
+    handler(request_dict). Runs until cancelled; removes the socket on exit.
+    Raise DaemonError if another daemon is already listening on path.
+
+    :param wallet: The wallet_id() of the wallet the handler uses. If given,
+      requests for any other wallet, or with the wrong passphrase, are refused.
+    :param phrase: The passphrase that unlocked wallet.
+    """
+    import asyncio
+
+    def wrong_wallet(req):
+        if wallet is None:
+            return False
+        return req.get('wallet') != wallet or not hmac.compare_digest(
+            str(req.get('phrase_digest')), phrase_digest(phrase))
+
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    req = codec.loads(line)
+                    if wrong_wallet(req):
+                        resp = {'ok': False, 'wrong_wallet': True,
+                                'error': "This daemon doesn't have that wallet open."}
+                    else:
+                        await handler(req)
+                        resp = {'ok': True}
+                except Exception as e:
+                    resp = {'ok': False, 'error': '%s: %s' % (e.__class__.__name__, e)}
+                writer.write(codec.dumps(resp, pretty=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    path = socket_path(path)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    if socket_in_use(path):
+        raise DaemonError('A dcs daemon is already listening on %s.' % path)
+    if os.path.exists(path):
+        # Left behind by a daemon that died.
+        os.unlink(path)
+    # Only the user who started the daemon gets to use their wallet. Nobody can
+    # connect until the socket listens, so lock it down between bind and listen.
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        os.chmod(path, 0o600)
+        server = await asyncio.start_unix_server(handle_connection, sock=sock, limit=_MAX_LINE)
+    except:
+        sock.close()
+        raise
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
@@ -17,9 +17,12 @@ from .. import log_helpers
 from . import base
 from .. import protocols
 from ..transports import folder_channel
+from ..transports import batching
 
 from indy import crypto, did, wallet
 
+_IDLE_CHECK_INTERVAL = 0.5
+
 
 class Agent(base.Agent):
 
@@ -39,7 +42,7 @@ class Agent(base.Agent):
         args = super().configure(parser, argv)
         self.queue_dir = os.path.join(self.folder, 'queue')
         os.makedirs(self.queue_dir, exist_ok=True)
-        self.trans = folder_channel.Channel(self.queue_dir, is_destward=False)
+        self.trans = folder_channel.Channel(self.queue_dir, is_destward=False, watch=True)
         self.endpoint = args.endpoint if args.endpoint else self.queue_dir
 
     async def handle_msg(self, wc):
@@ -72,30 +75,37 @@ class Agent(base.Agent):
             logging.warning(etxt)
         return handled
 
+    async def _handle_batch(self, batch):
+        # Handle each message on its own, so one bad message doesn't cost us
+        # the rest of the batch.
+        for wc in batch:
+            try:
+                await self.handle_msg(wc)
+            except KeyboardInterrupt:
+                raise
+            except json.decoder.JSONDecodeError as e:
+                logging.warning(str(e))
+            except:
+                log_helpers.log_exception()
+
     async def run(self):
         my_id = self.folder.replace(os.path.expanduser('~'), '~')
         logging.info('Agent at %s started.' % my_id)
-        wait_interval = 0.25
         try:
             while True:
                 try:
-                    wc = await self.trans.receive()
-                    if wc:
-                        wait_interval = 0.25
-                        await self.handle_msg(wc)
-                    elif wait_interval < 3:
-                        wait_interval *= 2
+                    # Wake up as soon as a message arrives, but check
+                    # for interruption now and then.
+                    batch = await self.trans.receive_batch(batching.DEFAULT_BATCH_SIZE, _IDLE_CHECK_INTERVAL)
+                    await self._handle_batch(batch)
                     if self.interrupt_requested:
                         break
-                    if not wc:
-                        await asyncio.sleep(wait_interval)
                 except KeyboardInterrupt:
                     return
-                except json.decoder.JSONDecodeError as e:
-                    logging.warning(str(e))
                 except:
                     log_helpers.log_exception()
         finally:
+            self.trans.close()
             logging.info('Agent at %s stopped.' % my_id)
 
 async def main():
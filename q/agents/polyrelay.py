@@ -3,26 +3,259 @@ A pluggable relay that lets you translate any agent transport into
 any different transport, for arbitrary testing scenarios.
 """
 import argparse
-import logging
 import asyncio
+import inspect
+import logging
 
+from .. import log_helpers
 from .. import transports
+from ..transports import batching
+
+# How long to wait for a message before giving an interrupter a chance to run.
+_IDLE_WAIT = 1
+DEFAULT_SEND_TIMEOUT = 30
+DEFAULT_MAX_IN_FLIGHT = 1
+# How many batches can wait to be sent, per destination.
+DEFAULT_MAX_QUEUE = 8
+
+
+class _Receipt:
+    """
+    Ack a batch at a source that supports it (see imap_receiver.Receiver.
+    take_leases()) once every destination has finished with the batch--and
+    only if every one of them sent it. Otherwise the source's lease runs
+    out, and the batch is delivered (and relayed) again.
+    """
+    def __init__(self, src, lease_ids, count):
+        self._src = src
+        self._lease_ids = lease_ids
+        self._pending = count
+        self._ok = True
+
+    def settle(self, ok):
+        self._ok = self._ok and ok
+        self._pending -= 1
+        if not self._pending and self._ok:
+            try:
+                self._src.ack(self._lease_ids)
+            except Exception:
+                log_helpers.log_exception('Acking %d message(s) at the source' % len(self._lease_ids))
+
+
+def _receipt_for(src, count):
+    take_leases = getattr(src, 'take_leases', None)
+    if take_leases:
+        lease_ids = take_leases()
+        if lease_ids:
+            return _Receipt(src, lease_ids, count)
+
+
+class Destination:
+    """
+    A place the relay sends to, with its own send timeout, its own queue of
+    batches waiting to go there, its own workers that drain that queue, and
+    its own tally of what happened to the messages sent there. A failure,
+    timeout or backlog at one destination is counted and logged, but doesn't
+    hold up any other destination.
+    """
+    def __init__(self, uri, sender, timeout=DEFAULT_SEND_TIMEOUT, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 max_queue=DEFAULT_MAX_QUEUE, drop_when_full=False):
+        """
+        :param max_in_flight: How many batches can be sending at once. With
+          more than one, batches may reach the destination out of order.
+        :param max_queue: How many batches can wait to be sent.
+        :param drop_when_full: What offer() does when the queue is full: drop
+          the batch (and count it) if true, else wait for room, which pushes
+          back on the source.
+        """
+        self.uri = uri
+        self.sender = sender
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.drop_when_full = drop_when_full
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._queue = asyncio.Queue(max_queue)
+        self._workers = []
+        self.sent = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.dropped = 0
+
+    async def _send_batch(self, payloads):
+        async with self._slots:
+            return await self.sender.send_batch(payloads, self.uri)
+
+    async def send_batch(self, payloads):
+        """Send payloads now; return True if all were sent. Never raises (except for cancellation)."""
+        try:
+            # The timeout covers waiting for a free slot, too, so a destination
+            # that's backed up can't hold the relay for longer than that.
+            results = await asyncio.wait_for(self._send_batch(payloads), self.timeout)
+            # Some senders report payloads they couldn't send in their results.
+            errors = [r for r in (results or []) if isinstance(r, Exception)]
+            self.sent += len(payloads) - len(errors)
+            if errors:
+                self.failed += len(errors)
+                logging.warning('Failed to send %d of %d message(s) to %s: %s' % (
+                    len(errors), len(payloads), self.uri, errors[0]))
+            return not errors
+        except asyncio.TimeoutError:
+            self.timed_out += len(payloads)
+            logging.warning('Timed out after %ss sending %d message(s) to %s.' % (
+                self.timeout, len(payloads), self.uri))
+        except KeyboardInterrupt:
+            raise
+        except Exception:
+            self.failed += len(payloads)
+            log_helpers.log_exception('Sending %d message(s) to %s' % (len(payloads), self.uri))
+        return False
+
+    async def _work(self):
+        while True:
+            payloads, receipt = await self._queue.get()
+            ok = False
+            try:
+                ok = await self.send_batch(payloads)
+            finally:
+                if receipt is not None:
+                    receipt.settle(ok)
+                self._queue.task_done()
+
+    def start(self):
+        """Start the workers that send what's offered."""
+        if not self._workers:
+            self._workers = [asyncio.ensure_future(self._work()) for i in range(self.max_in_flight)]
+
+    async def offer(self, payloads, receipt=None):
+        """
+        Queue payloads to be sent by this destination's workers. Return False if
+        the queue was full and the batch was dropped.
+
+        :param receipt: If given, its settle() is called with whether this
+          destination sent the batch, once it's done trying.
+        """
+        if self.drop_when_full:
+            try:
+                self._queue.put_nowait((payloads, receipt))
+            except asyncio.QueueFull:
+                self.dropped += len(payloads)
+                logging.warning('Dropped %d message(s) for %s; %d batches already queued.' % (
+                    len(payloads), self.uri, self._queue.qsize()))
+                if receipt is not None:
+                    receipt.settle(False)
+                return False
+        else:
+            await self._queue.put((payloads, receipt))
+        return True
+
+    @property
+    def depth(self):
+        """How many batches are waiting to be sent."""
+        return self._queue.qsize()
+
+    async def join(self):
+        """Wait until everything offered so far has been sent (or has failed)."""
+        await self._queue.join()
+
+    async def stop(self):
+        workers = self._workers
+        self._workers = []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def __str__(self):
+        return '%s: sent=%d, failed=%d, timed_out=%d, dropped=%d' % (
+            self.uri, self.sent, self.failed, self.timed_out, self.dropped)
 
 
-async def relay(src, dests):
-    mwc = await src.receive()
-    if mwc is not None:
-        data = mwc.ciphertext
-        if not data:
-            data = mwc.plaintext
+def _payloads(batch):
+    payloads = []
+    for mwc in batch:
+        # Forward exactly what arrived; relays never need to decode or parse it.
+        data = mwc.raw
         if data:
-            for pair in dests:
-                uri = pair[0]
-                obj = pair[1]
-                await obj.send(data, uri)
+            payloads.append(data)
         else:
             logging.info('No useful data from message.')
-        return mwc
+    return payloads
+
+
+async def fan_out(payloads, dests, concurrent=True):
+    """
+    Send payloads to each Destination in dests right away, and wait for all the
+    sends -- to all of them at once if concurrent is true, else one after
+    another. Return True if every destination got them.
+    """
+    if not payloads:
+        return True
+    if concurrent:
+        results = await asyncio.gather(*[dest.send_batch(payloads) for dest in dests])
+    else:
+        results = [await dest.send_batch(payloads) for dest in dests]
+    return all(results)
+
+
+async def relay(src, dests, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0, concurrent=True):
+    """
+    Receive a batch of up to max_items messages from src (waiting up to timeout
+    seconds for the first one), and fan it out to dests. Return the list of
+    messages received.
+    """
+    batch = await src.receive_batch(max_items, timeout)
+    await fan_out(_payloads(batch), dests, concurrent)
+    return batch
+
+
+async def pipeline(src, dests, max_items=batching.DEFAULT_BATCH_SIZE, concurrent=True, interrupter=None):
+    """
+    Relay from src to dests until interrupter (if any) says to stop. Receiving
+    and sending run as separate stages: the receive stage offers each batch to
+    every destination's own bounded queue, and each destination's workers send
+    from that queue at their own pace. A slow destination only backs up its own
+    queue; when that's full, it either drops batches or makes the receive stage
+    wait, as the destination was told to. If concurrent is false, each batch is
+    instead sent to one destination after another before the next is received.
+
+    A source with take_leases() and ack() (like imap_receiver.Receiver) has
+    each batch acked only after every destination has sent it.
+    """
+    if concurrent:
+        for dest in dests:
+            dest.start()
+    try:
+        while True:
+            batch = await src.receive_batch(max_items, _IDLE_WAIT)
+            payloads = _payloads(batch)
+            # Sources that can be acked are acked only once the batch is sent.
+            receipt = _receipt_for(src, len(dests) if payloads and concurrent else 1)
+            if payloads and concurrent:
+                for dest in dests:
+                    await dest.offer(payloads, receipt)
+            else:
+                sent = await fan_out(payloads, dests, False)
+                if receipt is not None:
+                    receipt.settle(sent)
+            if interrupter is not None:
+                if batch:
+                    if any(interrupter(msg) for msg in batch):
+                        break
+                elif interrupter(None):
+                    break
+        # Let the send stage finish what the receive stage handed it.
+        for dest in dests:
+            await dest.join()
+    finally:
+        for dest in dests:
+            await dest.stop()
+
+
+async def _call_if_present(obj, method_name):
+    method = getattr(obj, method_name, None)
+    if method and callable(method):
+        result = method()
+        if inspect.isawaitable(result):
+            await result
 
 
 async def main(argv, interrupter=None):
@@ -35,24 +268,38 @@ async def main(argv, interrupter=None):
                             help=f'A source like {" | ".join(transports.RECEIVER_EX)}.')
         parser.add_argument('dest', metavar='DEST', type=str, nargs='+',
                             help=f'A destination like {" | ".join(transports.SENDER_EX)}.')
+        parser.add_argument('--batch', metavar='N', type=int, default=batching.DEFAULT_BATCH_SIZE,
+                            help=f'Relay up to N messages at a time (default={batching.DEFAULT_BATCH_SIZE}).')
+        parser.add_argument('--timeout', metavar='SECS', type=float, default=DEFAULT_SEND_TIMEOUT,
+                            help=f'Give up on a send to a destination after SECS (default={DEFAULT_SEND_TIMEOUT}).')
+        parser.add_argument('--max-in-flight', metavar='N', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                            help=f'Allow up to N sends in flight per destination (default={DEFAULT_MAX_IN_FLIGHT}). ' +
+                            'With more than one, batches may arrive out of order.')
+        parser.add_argument('--max-queue', metavar='N', type=int, default=DEFAULT_MAX_QUEUE,
+                            help=f'Let up to N batches wait for each destination (default={DEFAULT_MAX_QUEUE}).')
+        parser.add_argument('--drop-when-full', action='store_true', default=False,
+                            help="Drop batches for a destination whose queue is full, instead of " +
+                            "making the source wait for it.")
+        parser.add_argument('--serial', action='store_true', default=False,
+                            help='Send each batch to destinations one after another, before receiving the next.')
 
         args = parser.parse_args(argv)
         src = transports.load(args.src, transports.RECEIVERS)
+        dests = []
         try:
-            dests = [(x, transports.load(x, transports.SENDERS)) for x in args.dest]
+            for uri in args.dest:
+                dests.append(Destination(uri, transports.load(uri, transports.SENDERS), args.timeout,
+                                         args.max_in_flight, args.max_queue, args.drop_when_full))
             logging.debug('Relaying from %s to %s' % (args.src, args.dest))
-            while True:
-                msg = await relay(src, dests)
-                if interrupter is not None:
-                    if interrupter(msg):
-                        break
-                if not msg:
-                    await asyncio.sleep(1)
+            await pipeline(src, dests, args.batch, not args.serial, interrupter)
         finally:
             # If I'm dealing with a receiver that's running a daemon, shut it down.
-            stopper = getattr(src, 'stop', None)
-            if stopper and callable(stopper):
-                await stopper()
+            await _call_if_present(src, 'stop')
+            await _call_if_present(src, 'close')
+            # Release any connections the senders are holding open.
+            for dest in dests:
+                await _call_if_present(dest.sender, 'close')
+                logging.info(str(dest))
     except KeyboardInterrupt:
         print('')
 
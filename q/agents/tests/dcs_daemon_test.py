@@ -0,0 +1,208 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import pytest
+
+from .. import dcs_daemon
+
+
+@pytest.fixture
+def scratch():
+    x = tempfile.TemporaryDirectory()
+    yield x.name
+    x.cleanup()
+
+
+@pytest.fixture
+async def daemon(scratch):
+    requests = []
+
+    async def handler(req):
+        if os.path.basename(req['dest']) == 'bad':
+            raise ValueError('no such destination')
+        requests.append(req)
+
+    path = os.path.join(scratch, 'dcs.sock')
+    task = asyncio.ensure_future(dcs_daemon.serve(path, handler))
+    while not os.path.exists(path):
+        await asyncio.sleep(0.01)
+    yield path, requests
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    assert not os.path.exists(path)
+
+
+def _run(func, *args):
+    # The client blocks, so keep it off the event loop the daemon runs on.
+    return asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+@pytest.mark.asyncio
+async def test_request(daemon):
+    path, requests = daemon
+    await _run(lambda: dcs_daemon.request('hello', '~/x', 'ALICE', ['BOB'], path))
+    assert requests == [{'msg': 'hello', 'dest': os.path.expanduser('~/x'), 'sender': 'ALICE', 'to': ['BOB'],
+                         'wallet': None, 'phrase_digest': dcs_daemon.phrase_digest(None)}]
+
+
+@pytest.mark.asyncio
+async def test_request_error(daemon):
+    path, requests = daemon
+    with pytest.raises(dcs_daemon.DaemonError) as e:
+        await _run(lambda: dcs_daemon.request('hello', 'bad', 'ALICE', ['BOB'], path))
+    assert 'no such destination' in str(e.value)
+
+
+@pytest.mark.asyncio
+async def test_client_main(daemon, scratch):
+    path, requests = daemon
+    msg_file = os.path.join(scratch, 'msg.json')
+    with open(msg_file, 'wt') as f:
+        f.write('{"@type": "x"}')
+    argv = [msg_file, '~/x', 'ALICE', 'MEDIATOR', 'BOB', '--socket', path, '--phrase', 'secret']
+    assert await _run(dcs_daemon.client_main, argv) == 0
+    assert requests[0]['to'] == ['MEDIATOR', 'BOB']
+    assert requests[0]['msg'] == '{"@type": "x"}'
+    assert await _run(dcs_daemon.client_main, [msg_file, 'bad', 'ALICE', 'BOB', '--socket', path]) == 1
+
+
+@pytest.mark.asyncio
+async def test_client_main_sends_absolute_paths(daemon, scratch, monkeypatch):
+    path, requests = daemon
+    msg_file = os.path.join(scratch, 'msg.json')
+    with open(msg_file, 'wt') as f:
+        f.write('{"@type": "x"}')
+    # The daemon has its own working directory, so a relative dest means nothing to it.
+    monkeypatch.chdir(scratch)
+    argv = ['msg.json', 'outbox', 'ALICE', 'BOB', '--socket', path]
+    assert await _run(dcs_daemon.client_main, argv) == 0
+    argv = ['msg.json', 'http://localhost:8080/x', 'ALICE', 'BOB', '--socket', path]
+    assert await _run(dcs_daemon.client_main, argv) == 0
+    assert [r['dest'] for r in requests] == [os.path.join(os.path.realpath(scratch), 'outbox'), 'http://localhost:8080/x']
+
+
+@pytest.mark.asyncio
+async def test_socket_is_private(scratch):
+    path = os.path.join(scratch, 'private', 'dcs.sock')
+
+    async def handler(req):
+        pass
+
+    task = asyncio.ensure_future(dcs_daemon.serve(path, handler))
+    while not dcs_daemon.socket_in_use(path):
+        await asyncio.sleep(0.01)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert os.stat(os.path.dirname(path)).st_mode & 0o077 == 0
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_absolute_dest():
+    assert dcs_daemon.absolute_dest('~/x') == os.path.join(os.path.expanduser('~'), 'x')
+    assert dcs_daemon.absolute_dest('/tmp/x') == '/tmp/x'
+    assert dcs_daemon.absolute_dest('stdout') == 'stdout'
+    assert dcs_daemon.absolute_dest('unix:///tmp/agent.sock') == 'unix:///tmp/agent.sock'
+
+
+@pytest.mark.asyncio
+async def test_serve_refuses_to_steal_live_socket(daemon):
+    path, requests = daemon
+
+    async def handler(req):
+        pass
+
+    with pytest.raises(dcs_daemon.DaemonError):
+        await dcs_daemon.serve(path, handler)
+    # The running daemon still owns the socket.
+    await _run(lambda: dcs_daemon.request('hello', 'http://x', 'ALICE', ['BOB'], path))
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_serve_replaces_stale_socket(scratch):
+    path = os.path.join(scratch, 'dcs.sock')
+    # Simulate a daemon that died without cleaning up.
+    s = socket.socket(socket.AF_UNIX)
+    s.bind(path)
+    s.close()
+    requests = []
+
+    async def handler(req):
+        requests.append(req)
+
+    task = asyncio.ensure_future(dcs_daemon.serve(path, handler))
+    while not dcs_daemon.socket_in_use(path):
+        await asyncio.sleep(0.01)
+    await _run(lambda: dcs_daemon.request('hello', 'http://x', 'ALICE', ['BOB'], path))
+    assert len(requests) == 1
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_client_main_parses_options_before_positionals(daemon, scratch):
+    path, requests = daemon
+    msg_file = os.path.join(scratch, 'msg.json')
+    with open(msg_file, 'wt') as f:
+        f.write('{"@type": "x"}')
+    argv = ['--phrase', 'secret', '--loglevel=debug', msg_file, 'http://x', 'ALICE', 'BOB', '--socket', path]
+    assert await _run(dcs_daemon.client_main, argv) == 0
+    assert requests[0]['dest'] == 'http://x'
+    assert requests[0]['sender'] == 'ALICE'
+    # Command lines the client doesn't understand are left to dcs itself.
+    assert await _run(dcs_daemon.client_main, argv + ['--bogus']) is None
+    assert await _run(dcs_daemon.client_main, [msg_file, '--socket', path]) is None
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_daemon_only_acts_for_its_own_wallet(scratch):
+    requests = []
+
+    async def handler(req):
+        requests.append(req)
+
+    path = os.path.join(scratch, 'dcs.sock')
+    wallet = dcs_daemon.wallet_id(os.path.join(scratch, 'agent'), 'alice')
+    task = asyncio.ensure_future(dcs_daemon.serve(path, handler, wallet, 'secret'))
+    while not dcs_daemon.socket_in_use(path):
+        await asyncio.sleep(0.01)
+    msg_file = os.path.join(scratch, 'msg.json')
+    with open(msg_file, 'wt') as f:
+        f.write('{"@type": "x"}')
+    argv = [msg_file, 'http://x', 'ALICE', 'BOB', '--socket', path, '--folder', os.path.join(scratch, 'agent')]
+    assert await _run(dcs_daemon.client_main, argv + ['--wallet', 'alice', '--phrase', 'secret']) == 0
+    # Another wallet, or the wrong passphrase: the client has to do it itself.
+    assert await _run(dcs_daemon.client_main, argv + ['--wallet', 'bob', '--phrase', 'secret']) is None
+    assert await _run(dcs_daemon.client_main, argv + ['--wallet', 'alice', '--phrase', 'guess']) is None
+    assert await _run(dcs_daemon.client_main, argv[:-2] + ['--wallet', 'alice', '--phrase', 'secret']) is None
+    assert len(requests) == 1
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_client_main_without_daemon(scratch):
+    path = os.path.join(scratch, 'nobody.sock')
+    assert dcs_daemon.client_main(['msg', 'dest', 'ALICE', 'BOB', '--socket', path]) is None
+    assert dcs_daemon.client_main(['--help']) is None
+
+
+def test_client_does_not_import_indy_or_asyncio():
+    code = 'import sys\nfrom q.agents import dcs_daemon\nprint("indy" in sys.modules, "asyncio" in sys.modules)\n'
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../..')
+    assert subprocess.check_output([sys.executable, '-c', code], cwd=root).split() == [b'False', b'False']
@@ -9,6 +9,7 @@ from aiohttp import web
 from unittest.mock import patch, call
 
 from .. import polyrelay
+from ...mwc import MessageWithContext
 from ...transports import folder_channel
 from ...transports import smtp_sender # must be imported despite lack of usage, because mock finds it by name
 
@@ -152,6 +153,245 @@ async def test_from_http(scratch_space):
     assert x.plaintext == 'hello'
 
 
+
+class FakeSrc:
+    def __init__(self, *payloads, delay=0):
+        self.payloads = list(payloads)
+        self.delay = delay
+    async def receive_batch(self, max_items, timeout=0):
+        if self.delay and self.payloads:
+            await asyncio.sleep(self.delay)
+        batch = [MessageWithContext(x) for x in self.payloads[:max_items]]
+        del self.payloads[:max_items]
+        return batch
+
+
+class LeasingSrc(FakeSrc):
+    """A source that, like imap_receiver.Receiver, must be told when a batch is handled."""
+    def __init__(self, *payloads, delay=0):
+        FakeSrc.__init__(self, *payloads, delay=delay)
+        self.leases = []
+        self.acked = []
+    async def receive_batch(self, max_items, timeout=0):
+        batch = await FakeSrc.receive_batch(self, max_items, timeout)
+        # Receiving again implicitly acks what wasn't taken.
+        self.ack()
+        self.leases = [wc.plaintext for wc in batch]
+        return batch
+    def take_leases(self):
+        leases, self.leases = self.leases, []
+        return leases
+    def ack(self, lease_ids=None):
+        if lease_ids is None:
+            lease_ids, self.leases = self.leases, []
+        self.acked.extend(lease_ids)
+
+
+class FakeSender:
+    def __init__(self, delay=0, error=None, refuse=()):
+        self.delay = delay
+        self.error = error
+        self.refuse = refuse
+        self.received = []
+    async def send_batch(self, payloads, uri):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        results = []
+        for payload in payloads:
+            if payload in self.refuse:
+                results.append(RuntimeError('refused ' + payload))
+            else:
+                self.received.append(payload)
+                results.append(None)
+        return results
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fanout():
+    dests = [polyrelay.Destination('d%d' % i, FakeSender(0.2)) for i in range(5)]
+    start = time.monotonic()
+    batch = await polyrelay.relay(FakeSrc('a', 'b'), dests)
+    # Sends overlap, so the total is about one send's latency, not five.
+    assert time.monotonic() - start < 0.6
+    assert len(batch) == 2
+    for dest in dests:
+        assert dest.sender.received == ['a', 'b']
+        assert dest.sent == 2
+
+
+@pytest.mark.asyncio
+async def test_failures_are_isolated():
+    fast = polyrelay.Destination('fast', FakeSender())
+    slow = polyrelay.Destination('slow', FakeSender(5), timeout=0.1)
+    broken = polyrelay.Destination('broken', FakeSender(error=RuntimeError('oops')))
+    dests = [slow, broken, fast]
+    for serial in [False, True]:
+        await polyrelay.relay(FakeSrc('a'), dests, concurrent=not serial)
+    assert fast.sender.received == ['a', 'a']
+    assert (fast.sent, fast.failed, fast.timed_out) == (2, 0, 0)
+    assert (slow.sent, slow.failed, slow.timed_out) == (0, 0, 2)
+    assert (broken.sent, broken.failed, broken.timed_out) == (0, 2, 0)
+    assert 'timed_out=2' in str(slow)
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_failure():
+    dest = polyrelay.Destination('d', FakeSender(refuse=('b',)))
+    assert not await dest.send_batch(['a', 'b', 'c'])
+    assert dest.sender.received == ['a', 'c']
+    assert (dest.sent, dest.failed) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_in_flight_limit():
+    sender = FakeSender(0.1)
+    dest = polyrelay.Destination('d', sender, max_in_flight=1)
+    start = time.monotonic()
+    await asyncio.gather(dest.send_batch(['a']), dest.send_batch(['b']))
+    assert time.monotonic() - start >= 0.2
+    assert sorted(sender.received) == ['a', 'b']
+
+
+
+@pytest.mark.asyncio
+async def test_slow_destination_does_not_block_fast_one():
+    fast = polyrelay.Destination('fast', FakeSender())
+    slow = polyrelay.Destination('slow', FakeSender(0.5))
+    for dest in [slow, fast]:
+        dest.start()
+    try:
+        for x in ['a', 'b', 'c']:
+            for dest in [slow, fast]:
+                await dest.offer([x])
+        await asyncio.sleep(0.2)
+        # The fast destination has batches 2 and 3 while the slow one is still sending batch 1.
+        assert fast.sender.received == ['a', 'b', 'c']
+        assert slow.sender.received == []
+        assert slow.depth == 2
+        await slow.join()
+        assert slow.sender.received == ['a', 'b', 'c']
+    finally:
+        for dest in [slow, fast]:
+            await dest.stop()
+
+
+@pytest.mark.asyncio
+async def test_drop_when_full():
+    slow = polyrelay.Destination('slow', FakeSender(0.3), max_queue=1, drop_when_full=True)
+    slow.start()
+    try:
+        assert await slow.offer(['a'])
+        await asyncio.sleep(0.05)
+        # 'a' is sending and 'b' waits; there's no room for 'c'.
+        assert await slow.offer(['b'])
+        assert not await slow.offer(['c'])
+        await slow.join()
+        assert slow.sender.received == ['a', 'b']
+        assert (slow.sent, slow.dropped) == (2, 1)
+        assert 'dropped=1' in str(slow)
+    finally:
+        await slow.stop()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_overlaps_stages():
+    src = FakeSrc('a', 'b', 'c', 'd', delay=0.1)
+    sender = FakeSender(0.1)
+    start = time.monotonic()
+    await polyrelay.pipeline(src, [polyrelay.Destination('d', sender)], max_items=1,
+                             interrupter=Interrupter(count=4))
+    # Done serially, this would take 0.8 secs.
+    assert time.monotonic() - start < 0.7
+    assert sender.received == ['a', 'b', 'c', 'd']
+
+
+@pytest.mark.asyncio
+async def test_pipeline_feeds_each_destination_separately():
+    src = FakeSrc('a', 'b', 'c')
+    fast = polyrelay.Destination('fast', FakeSender())
+    slow = polyrelay.Destination('slow', FakeSender(0.5))
+    task = asyncio.ensure_future(polyrelay.pipeline(src, [slow, fast], max_items=1,
+                                                    interrupter=Interrupter(count=3)))
+    await asyncio.sleep(0.2)
+    assert fast.sender.received == ['a', 'b', 'c']
+    assert slow.sender.received == []
+    await task
+    assert slow.sender.received == ['a', 'b', 'c']
+
+
+@pytest.mark.asyncio
+async def test_pipeline_acks_source_only_after_every_destination_sent():
+    src = LeasingSrc('a', 'b', 'c')
+    fast = polyrelay.Destination('fast', FakeSender())
+    slow = polyrelay.Destination('slow', FakeSender(0.3))
+    task = asyncio.ensure_future(polyrelay.pipeline(src, [slow, fast], max_items=1,
+                                                    interrupter=Interrupter(count=3)))
+    await asyncio.sleep(0.1)
+    # Everything has been received, but not everything has been sent.
+    assert fast.sender.received == ['a', 'b', 'c']
+    assert src.acked == []
+    await task
+    assert src.acked == ['a', 'b', 'c']
+
+
+@pytest.mark.asyncio
+async def test_pipeline_leaves_unsent_batches_unacked():
+    src = LeasingSrc('a', 'b', 'c', delay=0.01)
+    fast = polyrelay.Destination('fast', FakeSender())
+    full = polyrelay.Destination('full', FakeSender(0.2), max_queue=1, drop_when_full=True)
+    broken = polyrelay.Destination('broken', FakeSender(error=RuntimeError('down')))
+    await polyrelay.pipeline(src, [full, fast], max_items=1, interrupter=Interrupter(count=3))
+    # The dropped batch will be delivered again when its lease runs out.
+    assert full.dropped == 1
+    assert len(src.acked) == 2
+    src = LeasingSrc('a', 'b')
+    await polyrelay.pipeline(src, [fast, broken], max_items=1, interrupter=Interrupter(count=2))
+    assert src.acked == []
+    src = LeasingSrc('a', 'b')
+    await polyrelay.pipeline(src, [fast, broken], max_items=1, concurrent=False,
+                             interrupter=Interrupter(count=2))
+    assert src.acked == []
+
+
+@pytest.mark.asyncio
+async def test_pipeline_drops_only_for_full_destination():
+    src = FakeSrc('a', 'b', 'c', 'd', delay=0.01)
+    fast = polyrelay.Destination('fast', FakeSender(), max_queue=1, drop_when_full=True)
+    slow = polyrelay.Destination('slow', FakeSender(0.3), max_queue=1, drop_when_full=True)
+    start = time.monotonic()
+    await polyrelay.pipeline(src, [slow, fast], max_items=1, interrupter=Interrupter(count=4))
+    assert slow.sender.received == ['a', 'b']
+    assert (slow.sent, slow.dropped) == (2, 2)
+    assert fast.sender.received == ['a', 'b', 'c', 'd']
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_backpressure_when_full():
+    src = FakeSrc('a', 'b', 'c', 'd')
+    slow = polyrelay.Destination('slow', FakeSender(0.1), max_queue=1)
+    await polyrelay.pipeline(src, [slow], max_items=1, interrupter=Interrupter(count=4))
+    assert slow.sender.received == ['a', 'b', 'c', 'd']
+    assert slow.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_multiple_in_flight(scratch_space):
+    dest = tempfile.TemporaryDirectory()
+    try:
+        fsrc = folder_channel.Channel(scratch_space.name)
+        for i in range(5):
+            await fsrc.send(str(i))
+        await polyrelay.main([scratch_space.name, dest.name, '--max-in-flight', '3', '--batch', '1'],
+                             Interrupter(count=5))
+        fdest = folder_channel.Channel(dest.name, is_destward=False)
+        batch = await fdest.receive_batch(10)
+        assert sorted(x.plaintext for x in batch) == ['0', '1', '2', '3', '4']
+    finally:
+        dest.cleanup()
+
+
 if __name__ == '__main__':
     asyncio.get_event_loop().set_debug(True)
     pytest.main([__file__])
\ No newline at end of file
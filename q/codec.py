@@ -0,0 +1,101 @@
+"""
+JSON (de)serialization for messages. Every message goes through several
+loads/dumps calls, so this uses the fastest library available: orjson, then
+ujson, then the standard library.
+
+Output is compact (no indentation or extra spaces), which is smaller on the
+wire as well as faster. Set Q_PRETTY_JSON=1 to get indented output, e.g.
+while debugging. Set Q_JSON_CODEC to orjson, ujson or json to choose a
+library explicitly.
+"""
+import json
+import os
+
+PRETTY_ENV_VAR = 'Q_PRETTY_JSON'
+CODEC_ENV_VAR = 'Q_JSON_CODEC'
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+PRETTY = _env_flag(PRETTY_ENV_VAR)
+
+
+class _Stdlib:
+    name = 'json'
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj, pretty):
+        if pretty:
+            return json.dumps(obj, indent=2)
+        return json.dumps(obj, separators=(',', ':'))
+
+
+class _Orjson:
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self.loads = orjson.loads
+        self._compact = orjson.OPT_NON_STR_KEYS
+        self._pretty = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+
+    def dumps(self, obj, pretty):
+        return self._orjson.dumps(obj, option=self._pretty if pretty else self._compact).decode('utf-8')
+
+
+class _Ujson:
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def loads(self, data):
+        try:
+            return self._ujson.loads(data)
+        except ValueError as e:
+            # Callers expect the same exception whatever the library.
+            raise json.JSONDecodeError(str(e), data if isinstance(data, str) else '', 0) from None
+
+    def dumps(self, obj, pretty):
+        # ujson escapes / as \/ by default; other libraries don't.
+        return self._ujson.dumps(obj, indent=2 if pretty else 0, ensure_ascii=True,
+                                 escape_forward_slashes=False)
+
+
+_BACKENDS = {'orjson': _Orjson, 'ujson': _Ujson, 'json': _Stdlib}
+
+
+def get_backend(name=None):
+    """
+    Return the backend named name, or the fastest one installed if name is
+    None. Raise ImportError if the named library isn't installed.
+    """
+    if name:
+        return _BACKENDS[name]()
+    for cls in (_Orjson, _Ujson):
+        try:
+            return cls()
+        except ImportError:
+            pass
+    return _Stdlib()
+
+
+backend = get_backend(os.environ.get(CODEC_ENV_VAR) or None)
+
+
+def loads(data):
+    """Deserialize a JSON str or bytes. Raise json.JSONDecodeError if data isn't valid JSON."""
+    return backend.loads(data)
+
+
+def dumps(obj, pretty=None) -> str:
+    """Serialize obj to a str of JSON, indented only if pretty (default: Q_PRETTY_JSON)."""
+    return backend.dumps(obj, PRETTY if pretty is None else pretty)
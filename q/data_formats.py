@@ -14,56 +14,72 @@ def is_base64(data):
     return _BASE64_PAT.match(data)
 
 
-no_byte_converter = lambda x: x
+# JSON allows only these four whitespace characters between tokens.
+_JSON_WS = ' \r\n\t'
+_JSON_WS_BYTES = _JSON_WS.encode('ascii')
+_OPENS_OBJECT_PAT = re.compile('[%s]*{' % _JSON_WS)
+_OPENS_OBJECT_BYTES_PAT = re.compile(_OPENS_OBJECT_PAT.pattern.encode('ascii'))
+# How much of the end of a message to strip, looking for its last non-whitespace char.
+_TAIL_WINDOW = 256
+
+
+def _last_non_ws(data, ws):
+    """Return the index of the last non-whitespace item in data, or -1."""
+    # Messages rarely end with much whitespace, so look at a small window first
+    # rather than copying the whole message with rstrip().
+    start = max(0, len(data) - _TAIL_WINDOW)
+    tail = data[start:].rstrip(ws)
+    if tail or not start:
+        return start + len(tail) - 1
+    return len(data[:start].rstrip(ws)) - 1
 
-def _get_byte_converter(data):
-    return ord if isinstance(data, str) else no_byte_converter
 
-
-def _span(big, big_idx, end, small, to_byte):
-    while big_idx != end:
-        byte = to_byte(big[big_idx])
-        if byte not in small:
-            break
-        big_idx += 1
-    return big_idx
-
-
-_WHITESPACE_CHARS = b' \r\n\t'
-_OPEN_BRACE_BYTE = 123 # {
-_CLOSE_BRACE_BYTE = 125 # }
 def is_likely_json(data: bytes) -> bool:
-    if data:
-        to_byte = _get_byte_converter(data)
-        end = len(data)
-        i = _span(data, 0, end, _WHITESPACE_CHARS, to_byte)
-        if i < end:
-            byte = to_byte(data[i])
-            if byte != _OPEN_BRACE_BYTE:
-                return False
-            j = len(data)
-            while j > i:
-                j -= 1
-                byte = to_byte(data[j])
-                if byte not in _WHITESPACE_CHARS:
-                    return byte == _CLOSE_BRACE_BYTE
+    """
+    Return True if data (bytes or str) looks like a JSON object: its first and
+    last non-whitespace characters are { and }. This only looks at the ends of
+    data, so it takes about the same time no matter how big data is.
+    """
+    if isinstance(data, str):
+        pat, ws, open_, close = _OPENS_OBJECT_PAT, _JSON_WS, '{', '}'
+    elif isinstance(data, (bytes, bytearray)):
+        pat, ws, open_, close = _OPENS_OBJECT_BYTES_PAT, _JSON_WS_BYTES, b'{', b'}'
+    else:
+        return False
+    # Most messages start and end with their braces; check for that first.
+    if data[:1] == open_:
+        start = 1
+    else:
+        m = pat.match(data)
+        if not m:
             return False
-    return False
+        start = m.end()
+    if data[-1:] == close:
+        return len(data) > start
+    j = _last_non_ws(data, ws)
+    return j >= start and data[j:j + 1] == close
+
 
+# We might get very large messages, and we don't want to run huge scans over them.
+# A wire-format message should have a field named "protected" or "ciphertext" --
+# quoted, and followed by whitespace+colon+whitespace+double_quote -- that starts
+# in the first few KB. Searches stop a little past that limit (far enough to match
+# a key that starts right at the limit, plus generous whitespace).
+WIRE_FORMAT_SCAN_LIMIT = 8192
+_WIRE_KEY_SLACK = 256
+_WIRE_KEY_PAT = re.compile('"(?:protected|ciphertext)"[%s]*:[%s]*"' % (_JSON_WS, _JSON_WS))
+_WIRE_KEY_BYTES_PAT = re.compile(_WIRE_KEY_PAT.pattern.encode('ascii'))
 
-_PROTECTED_KEY_PAT = re.compile(r'.{0,8192}"protected"\s*:\s*"', re.S)
-_CIPHERTEXT_KEY_PAT = re.compile(r'.{0,8192}"ciphertext"\s*:\s*"', re.S)
-_DOUBLE_QUOTE_BYTE = 34 # "
-_COLON_BYTE = 58
 
-def _match_bytes(big, big_idx, small):
-    n = len(small)
-    for i in range(n):
-        if big[i + big_idx] != small[i]:
-            return 0
-    return n
+# How much of the start and end of a message the checks here look at. A sample made
+# of just those two parts classifies the same way as the whole message (barring
+# hundreds of bytes of whitespace at either end), so huge messages that live on
+# disk need not be read in full.
+SAMPLE_HEAD_SIZE = WIRE_FORMAT_SCAN_LIMIT + _WIRE_KEY_SLACK
+SAMPLE_TAIL_SIZE = _TAIL_WINDOW
 
-def is_likely_wire_format(data, known_json=False):
+
+def is_likely_wire_format(data, known_json=False) -> bool:
     if not data:
         return False
 
@@ -78,24 +94,6 @@ def is_likely_wire_format(data, known_json=False):
         if not is_likely_json(data):
             return False
 
-    # We might get very large messages, and we don't want to run huge scans over them.
-    # If we have a string, we use special regexes that limit how much gets scanned before
-    # we give up. If we have bytes, we use an algorithm that's sort of like a limited
-    # regex. We should be able to find a field named "protected" or "ciphertext" that's
-    # quoted and followed by whitespace+colon+whitespace+double_quote in the first few
-    # KB of a message.
-    if isinstance(data, str):
-        return _PROTECTED_KEY_PAT.match(data) or _CIPHERTEXT_KEY_PAT.match(data)
-
-    n = min(len(data) - 100, 8192)
-    for i in range(n):
-        byte = data[i]
-        if byte == _DOUBLE_QUOTE_BYTE:
-            x = _match_bytes(data, i, b'"protected"')
-            if not x:
-                x = _match_bytes(data, i, b'"ciphertext"')
-            if x:
-                i = _span(data, i + x, n, _WHITESPACE_CHARS, no_byte_converter)
-                if i < n and data[i] == _COLON_BYTE:
-                    i = _span(data, i + 1, n, _WHITESPACE_CHARS, no_byte_converter)
-                    return data[i] == _DOUBLE_QUOTE_BYTE
+    pat = _WIRE_KEY_PAT if isinstance(data, str) else _WIRE_KEY_BYTES_PAT
+    m = pat.search(data, 0, WIRE_FORMAT_SCAN_LIMIT + _WIRE_KEY_SLACK)
+    return bool(m) and m.start() <= WIRE_FORMAT_SCAN_LIMIT
@@ -1,5 +1,4 @@
-import json
-
+from . import codec
 from . import did
 
 MAIN_CONTEXT = "https://w3id.org/did/v1"
@@ -7,7 +6,7 @@ MAIN_CONTEXT = "https://w3id.org/did/v1"
 class DIDDoc:
     def __init__(self, obj):
         if isinstance(obj, str):
-            obj = json.loads(obj)
+            obj = codec.loads(obj)
         self.obj = obj
 
     @classmethod
@@ -45,4 +44,4 @@ class DIDDoc:
         return DIDDoc(dict)
 
     def __str__(self):
-        return json.dumps(self.obj, indent=2)
+        return codec.dumps(self.obj)
@@ -1,7 +1,8 @@
 import sqlite3
 import datetime
 import time
-import json
+
+from . import codec
 
 def get_timestamp():
     return int(time.time())
@@ -49,7 +50,7 @@ class Interaction:
     @data.setter
     def data(self, value):
         if isinstance(value, dict):
-            data = json.dumps(value)
+            data = codec.dumps(value)
         self._data = value
 
     def __iter__(self):
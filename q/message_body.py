@@ -0,0 +1,201 @@
+"""
+The content of a message as a transport reads it: held in memory while it's
+small, and spooled to a temp file once it grows past a threshold, so a relay
+handling a 10 MB message doesn't need 10 MB (or 20 MB, counting a decoded
+copy) of RAM for it. The size limit is checked as each chunk arrives, so an
+oversized message is rejected without ever being read in full.
+
+MessageWithContext accepts a MessageBody wherever it accepts bytes. Small
+bodies are turned into plain bytes right away; spooled ones are kept as is,
+and are only read in full if someone asks for .plaintext or .obj. Senders
+that can stream (http, folder, file) send a spooled body chunk by chunk;
+others call as_bytes().
+"""
+import aiofiles
+import asyncio
+import io
+import tempfile
+import threading
+
+DEFAULT_SPOOL_THRESHOLD = 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class TooLarge(ValueError):
+    pass
+
+
+class MessageBody:
+    """
+    A byte string that's written once, in chunks, then read any number of
+    times. There is only one file object, so every read seeks to where it
+    wants to start and reads in the same step, under a lock. Several senders
+    can stream the same body at once only because nothing gets between that
+    seek and read--no await, and no other thread.
+    """
+    __slots__ = ('max_size', 'spool_threshold', '_file', '_size', '_spooled', '_lock')
+
+    def __init__(self, max_size=None, spool_threshold=DEFAULT_SPOOL_THRESHOLD):
+        """
+        :param max_size: Raise TooLarge as soon as more than this many bytes
+          are written. None means no limit.
+        :param spool_threshold: Move the content to a temp file once it's
+          bigger than this many bytes.
+        """
+        self.max_size = max_size
+        self.spool_threshold = spool_threshold
+        self._file = io.BytesIO()
+        self._size = 0
+        self._spooled = False
+        self._lock = threading.Lock()
+
+    def _spool(self):
+        f = tempfile.TemporaryFile()
+        with self._file.getbuffer() as content:
+            f.write(content)
+        self._file = f
+        self._spooled = True
+
+    def write(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        size = self._size + len(chunk)
+        if self.max_size is not None and size > self.max_size:
+            raise TooLarge("Size exceeds %d; message can't be processed." % self.max_size)
+        with self._lock:
+            if not self._spooled and size > self.spool_threshold:
+                self._spool()
+            self._file.seek(self._size)
+            self._file.write(chunk)
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    @property
+    def spooled(self):
+        """True if the content has moved to a temp file."""
+        return self._spooled
+
+    def _read_at(self, pos, n):
+        with self._lock:
+            self._file.seek(pos)
+            return self._file.read(n)
+
+    def head(self, n):
+        """Return the first n bytes."""
+        return self._read_at(0, n)
+
+    def tail(self, n):
+        """Return the last n bytes."""
+        start = max(0, self._size - n)
+        return self._read_at(start, self._size - start)
+
+    def read(self) -> bytes:
+        """Return the whole content. For a spooled body, this is the one full copy in memory."""
+        if not self._spooled:
+            return self._file.getvalue()
+        return self._read_at(0, self._size)
+
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield the content, chunk_size bytes at a time."""
+        pos = 0
+        while pos < self._size:
+            chunk = self._read_at(pos, min(chunk_size, self._size - pos))
+            if not chunk:
+                break
+            pos += len(chunk)
+            yield chunk
+
+    async def async_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Like chunks(), but a spooled body is read in a worker thread, so
+        disk reads don't block the event loop.
+        """
+        if not self.spooled:
+            for chunk in self.chunks(chunk_size):
+                yield chunk
+            return
+        loop = asyncio.get_running_loop()
+        pos = 0
+        while pos < self._size:
+            chunk = await loop.run_in_executor(None, self._read_at, pos, min(chunk_size, self._size - pos))
+            if not chunk:
+                break
+            pos += len(chunk)
+            yield chunk
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @classmethod
+    async def from_stream(cls, stream, max_size=None, spool_threshold=DEFAULT_SPOOL_THRESHOLD,
+                          chunk_size=DEFAULT_CHUNK_SIZE):
+        """Read an aiohttp StreamReader (or anything with iter_chunked()) to its end."""
+        body = cls(max_size, spool_threshold)
+        try:
+            async for chunk in stream.iter_chunked(chunk_size):
+                body.write(chunk)
+        except:
+            body.close()
+            raise
+        return body
+
+    @classmethod
+    async def from_path(cls, path, max_size=None, spool_threshold=DEFAULT_SPOOL_THRESHOLD,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+        """Read the file at path."""
+        body = cls(max_size, spool_threshold)
+        try:
+            async with aiofiles.open(path, 'rb') as f:
+                while True:
+                    chunk = await f.read(chunk_size)
+                    if not chunk:
+                        break
+                    body.write(chunk)
+        except:
+            body.close()
+            raise
+        return body
+
+    @classmethod
+    def from_handle(cls, handle, max_size=None, spool_threshold=DEFAULT_SPOOL_THRESHOLD,
+                    chunk_size=DEFAULT_CHUNK_SIZE):
+        """Read whatever a (blocking) file handle has available."""
+        body = cls(max_size, spool_threshold)
+        try:
+            while True:
+                chunk = handle.read(chunk_size)
+                if not chunk:
+                    break
+                body.write(chunk)
+        except:
+            body.close()
+            raise
+        return body
+
+
+def as_bytes(payload):
+    """Return payload (bytes, str, or MessageBody) as bytes."""
+    if isinstance(payload, str):
+        return payload.encode('utf-8')
+    if isinstance(payload, MessageBody):
+        return payload.read()
+    return payload
+
+
+def chunks_of(payload, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield payload (bytes, str, or MessageBody) in chunks, without copying a spooled body into memory."""
+    if isinstance(payload, MessageBody):
+        yield from payload.chunks(chunk_size)
+    else:
+        yield as_bytes(payload)
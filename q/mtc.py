@@ -45,6 +45,8 @@ class MessageTrustContext:
     Describe the trust guarantees associated with a given message.
     See http://bit.ly/2UutabT for more information.
     """
+    __slots__ = ('_affirmed', '_denied')
+
     def __init__(self, affirmed: int = 0, denied: int = 0):
         precondition(affirmed & denied == 0, "what's affirmed and denied can't overlap")
         self._affirmed = affirmed
@@ -142,3 +144,13 @@ class MessageTrustContext:
 
     def __str__(self):
         return self.abbrevs
+
+
+class FrozenTrustContext(MessageTrustContext):
+    """A MessageTrustContext that can't be changed after it's built, so it can be shared."""
+    __slots__ = ()
+
+    def _frozen(self, flags):
+        raise TypeError("This trust context can't be changed.")
+
+    affirm = deny = undefine = _frozen
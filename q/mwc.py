@@ -1,5 +1,8 @@
 import datetime
-import json
+import time
+
+from . import codec
+from .message_body import MessageBody
 
 from .mtc import *
 from .data_formats import *
@@ -11,6 +14,11 @@ _MSG_TYPE_URI_PAT = re.compile(r'(.*?)([a-z0-9._-]+)/(\d[^/]*)/([a-z0-9._-]+)$')
 
 MAX_MESSAGE_SIZE = 1024 * 1024 * 10
 
+# The wall clock and the monotonic clock, read together once, so a monotonic
+# timestamp can be turned into a datetime when someone asks for one.
+_WALL_AT_START = datetime.datetime.utcnow()
+_MONOTONIC_AT_START = time.monotonic_ns()
+
 
 def _check_size(data, tc: MessageTrustContext, force = False):
     if force:
@@ -21,6 +29,25 @@ def _check_size(data, tc: MessageTrustContext, force = False):
         tc.affirm(SIZE_OK)
 
 
+# Marks .obj as not yet deserialized.
+_LAZY = object()
+
+
+def _head(value, n=300):
+    """Return the first n characters of value (bytes, str or MessageBody) as str, without decoding the rest."""
+    value = value.head(n) if isinstance(value, MessageBody) else value[:n]
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8', errors='replace')
+    return value
+
+
+def _sample(body):
+    """Return enough of a MessageBody for is_likely_json() and is_likely_wire_format() to judge it."""
+    if len(body) <= SAMPLE_HEAD_SIZE + SAMPLE_TAIL_SIZE:
+        return body.read()
+    return body.head(SAMPLE_HEAD_SIZE) + body.tail(SAMPLE_TAIL_SIZE)
+
+
 class MessageWithContext:
     """
     Hold a message plus its associated trust context, sender, and other metadata.
@@ -31,28 +58,39 @@ class MessageWithContext:
     decryption is performed and .plaintext is assigned. If not encrypted, then .ciphertext is
     None, but .plaintext is immediately useful.
 
-    .plaintext is always a string.
+    .plaintext is always a string. .raw is the content the message was init'ed with,
+    untouched; relays should forward it instead of .plaintext, to avoid decoding. The
+    content may also be a message_body.MessageBody; if it has been spooled to disk, .raw
+    (and .ciphertext) is that MessageBody, and it's only read into memory when .plaintext
+    or .obj is needed.
 
-    Whenever .plaintext is assigned, .obj is also built. .obj is a dict built by deserializing
-    .plaintext. It may be None, if deserialization has failed.
+    .obj is a dict built by deserializing .plaintext. It may be None, if deserialization has
+    failed. Nothing is decoded or deserialized until it's asked for: .plaintext decodes on
+    first access, and .obj (and .type, .id, .thid and .sender, which come from it) parses
+    on first access. That's also when DESERIALIZE_OK is affirmed or denied in .tc.
+
+    Relays may create tens of thousands of these a second, so instances have no __dict__,
+    and the arrival time is kept as a monotonic int until .in_time is read.
     """
+    __slots__ = ('_in_ns', 'tc', '_raw', '_ciphertext', '_plaintext', '_obj', 'interaction',
+                 'state_machine')
+
     def __init__(self, raw: bytes = None, tc: MessageTrustContext = None):
-        self.in_time = datetime.datetime.utcnow()
+        self._in_ns = time.monotonic_ns()
         if tc is None:
             tc = MessageTrustContext()
         self.tc = tc
+        if isinstance(raw, MessageBody) and not raw.spooled:
+            raw = raw.read()
+        self._raw = raw
         self._ciphertext = None
-        self._plaintext = None
-        self._obj = None
-        self.id = None
-        self.thid = None
-        self.type = None
         self.interaction = None
         self.state_machine = None
         _check_size(raw, tc)
         try_deserialize = True
-        if is_likely_json(raw):
-            if is_likely_wire_format(raw):
+        sample = _sample(raw) if isinstance(raw, MessageBody) else raw
+        if is_likely_json(sample):
+            if is_likely_wire_format(sample, known_json=True):
                 self._ciphertext = raw
                 # We can't affirm anything about the ciphertext until we try to decrypt
             else:
@@ -62,50 +100,86 @@ class MessageWithContext:
             try_deserialize = False
         # If we get here, we don't have reason to believe the message is encrypted.
         # Therefore, treat it like plaintext.
-        self._set_plaintext_and_obj(raw, try_deserialize)
+        self._plaintext = raw
+        self._obj = _LAZY if try_deserialize and raw else None
+
+    @property
+    def in_time(self):
+        """When the message was created, as a naive UTC datetime (like utcnow())."""
+        return _WALL_AT_START + datetime.timedelta(microseconds=(self._in_ns - _MONOTONIC_AT_START) // 1000)
 
     @property
     def sender(self):
         if self.obj:
             return self.obj.get('sender_verkey', None)
 
+    @property
+    def raw(self):
+        return self._raw
+
     @property
     def ciphertext(self):
         return self._ciphertext
 
     @property
     def plaintext(self):
-        return self._plaintext
+        value = self._plaintext
+        if isinstance(value, MessageBody):
+            value = value.read()
+        if isinstance(value, (bytes, bytearray)):
+            value = self._plaintext = value.decode('utf-8')
+        return value
 
     @plaintext.setter
     def plaintext(self, value):
         _check_size(value, self.tc, force=True)
-        self._set_plaintext_and_obj(value)
-
-    def _set_plaintext_and_obj(self, value, try_deserialize=True):
-        if isinstance(value, bytes):
-            value = value.decode('utf-8')
+        self.tc.undefine(DESERIALIZE_OK)
         self._plaintext = value
-        self._obj = self.type = self.id = self.thid = None
-        if value:
-            if try_deserialize:
-                self.tc.undefine(DESERIALIZE_OK)
-                try:
-                    obj = json.loads(value)
-                    self._obj = obj
-                    self.tc.affirm(DESERIALIZE_OK)
-                    self.type = obj.get('@type')
-                    self.id = obj.get('@id')
-                    self.thid = obj.get('~thread', {}).get('thid')
-                except:
-                    self.tc.deny(DESERIALIZE_OK) # Let caller discover problem on their own
+        self._obj = _LAZY if value else None
 
     @property
     def obj(self):
+        if self._obj is _LAZY:
+            self._deserialize()
         return self._obj
 
+    def _deserialize(self):
+        self._obj = None
+        try:
+            # codec.loads() takes bytes as well as str, so there's no need to decode first.
+            value = self._plaintext
+            if isinstance(value, MessageBody):
+                value = value.read()
+            obj = codec.loads(value)
+            self._obj = obj
+            if isinstance(obj, dict):
+                self.tc.affirm(DESERIALIZE_OK)
+            else:
+                self.tc.deny(DESERIALIZE_OK)
+        except:
+            self.tc.deny(DESERIALIZE_OK) # Let caller discover problem on their own
+
+    def _get(self, key):
+        obj = self.obj
+        if isinstance(obj, dict):
+            return obj.get(key)
+
+    @property
+    def type(self):
+        return self._get('@type')
+
+    @property
+    def id(self):
+        return self._get('@id')
+
+    @property
+    def thid(self):
+        thread = self._get('~thread')
+        if isinstance(thread, dict):
+            return thread.get('thid')
+
     def __bool__(self):
-        return bool(self._ciphertext) or bool(self._plaintext) or bool(self._obj)
+        return bool(self._ciphertext) or bool(self._plaintext) or (self._obj is not _LAZY and bool(self._obj))
 
     def __str__(self):
         """
@@ -113,15 +187,9 @@ class MessageWithContext:
         to a problem report.
         """
         msg_fragment = None
-        txt = self.plaintext
+        txt = self._plaintext or self.ciphertext
         if txt:
-            txt = txt[:300]
-        else:
-            txt = self.ciphertext
-            if txt:
-                txt = txt[:300]
-                if isinstance(txt, bytes):
-                    txt = txt.decode('utf-8')
+            txt = _head(txt)
         if txt:
             good_descriptors = []
             m = _TYPE_PAT.search(txt)
@@ -158,10 +226,28 @@ class MessageWithContext:
 
     def get_type(self):
         if self.ciphertext:
-            match = _TYPE_PAT.search(self.ciphertext)
+            # Ciphertext may be bytes or a spooled MessageBody; only its head matters.
+            match = _TYPE_PAT.search(_head(self.ciphertext, SAMPLE_HEAD_SIZE))
             if match:
                 return match.group(1)
 
 
+class _NullMessageWithContext(MessageWithContext):
+    """An empty message that can't be changed, so everyone can share it."""
+    __slots__ = ()
+
+    def __init__(self):
+        empty = MessageWithContext()
+        for name in MessageWithContext.__slots__:
+            object.__setattr__(self, name, getattr(empty, name))
+        object.__setattr__(self, 'tc', FrozenTrustContext(empty.tc.affirmed, empty.tc.denied))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NULL_MWC can't be changed; make a new MessageWithContext instead.")
+
+    def __delattr__(self, name):
+        self.__setattr__(name, None)
+
+
 """A special global constant representing degenerate, empty MessageWithContext."""
-NULL_MWC = MessageWithContext()
+NULL_MWC = _NullMessageWithContext()
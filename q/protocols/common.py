@@ -1,8 +1,8 @@
-import json
 import uuid
 import datetime
 import re
 
+from .. import codec
 from ..protocols import HANDLERS
 
 PROBLEM_REPORT_MSG_TYPE = "did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/notification/1.0/problem-report"
@@ -28,7 +28,7 @@ def start_msg(typ: str, thid: str = None, in_time: datetime.datetime = None):
 def finish_msg(json_dict):
     if json_dict.get('~timing'):
         json_dict['~timing']['out_time'] = datetime.datetime.utcnow().isoformat()
-    return json.dumps(json_dict, indent=2)
+    return codec.dumps(json_dict)
 
 
 def get_thread_id_from_text(txt):
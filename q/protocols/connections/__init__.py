@@ -2,6 +2,7 @@
 
 import indy
 
+from ... import codec
 from ..common import start_msg, finish_msg, problem_report
 from ...protocols import compare_identifiers
 from ..exceptions import ProtocolAnomaly
@@ -37,7 +38,7 @@ async def handle(wc, parsed_type, agent):
     try:
         # Do we have a pre-existing thread with cumulative state?
         if wc.interaction:
-            sm = json.loads(wc.interaction.data.get('state_machine'))
+            sm = codec.loads(wc.interaction.data.get('state_machine'))
             role = sm.get('role')
             if role == 'inviter':
                 wc.state_machine = Inviter()
@@ -102,7 +103,7 @@ async def handle_response(wc, agent):
         did_doc = DIDDoc.from_json(conn.get('did_doc', {}))
         verkey = get_first_verkey(did_doc)
         if verkey:
-            await indy.did.store_their_did(agent.wallet_handle, json.dumps({"did": did, "verkey": verkey}))
+            await indy.did.store_their_did(agent.wallet_handle, codec.dumps({"did": did, "verkey": verkey}))
             wc.state_machine.handle(RECEIVE_CONN_RESP_EVENT)
             wc.interaction.data["state_machine"] = wc.state_machine.to_json()
             wc.interaction.data = data
@@ -163,7 +164,7 @@ async def make_conn_resp(conn, agent, thread_id=None, in_time=None):
     did_doc = DIDDoc.from_json(conn.get('did_doc', {}))
     their_verkey = get_first_verkey(did_doc)
     if their_verkey:
-        await indy.did.store_their_did(agent.wallet_handle, json.dumps({"did": did, "verkey": their_verkey}))
+        await indy.did.store_their_did(agent.wallet_handle, codec.dumps({"did": did, "verkey": their_verkey}))
         did, verkey = await indy.did.create_and_store_my_did(agent.wallet_handle, '{}')
         type_ = CONNECTIONS_PROTOCOL_NAME + '/' + RESPONSE_MSG_TYPE
         msg = start_msg(type_, thid=thread_id, in_time=in_time)
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from .. import codec
+
+MSG = {
+    "@type": "did:sov:BzCbsNYhMrjHiqZDTUASHg;spec/trust_ping/1.0/ping",
+    "@id": "518be002-de8e-456e-b3d5-8fe472477a86",
+    "~thread": {"thid": "abc", "sender_order": 0},
+    "comment": "Hi. Are you listening? é",
+    "n": [1, 2.5, None, True],
+}
+
+
+def _backends():
+    names = []
+    for name in ['orjson', 'ujson', 'json']:
+        try:
+            codec.get_backend(name)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+@pytest.fixture(params=_backends())
+def backend(request):
+    return codec.get_backend(request.param)
+
+
+def test_round_trip(backend):
+    txt = backend.dumps(MSG, False)
+    assert isinstance(txt, str)
+    assert backend.loads(txt) == MSG
+    assert backend.loads(txt.encode('utf-8')) == MSG
+
+
+def test_compact_unless_pretty(backend):
+    compact = backend.dumps(MSG, False)
+    assert '\n' not in compact
+    assert len(compact) < len(json.dumps(MSG))
+    pretty = backend.dumps(MSG, True)
+    assert '\n  "@id"' in pretty
+    assert json.loads(pretty) == MSG
+
+
+def test_slashes_not_escaped(backend):
+    assert backend.dumps({"a": "x/1.0/y"}, False) == '{"a":"x/1.0/y"}'
+
+
+def test_bad_json(backend):
+    with pytest.raises(json.JSONDecodeError):
+        backend.loads('{"a": ')
+    with pytest.raises(json.JSONDecodeError):
+        backend.loads(b'not json')
+
+
+def test_default_pretty(monkeypatch):
+    monkeypatch.setattr(codec, 'PRETTY', False)
+    assert '\n' not in codec.dumps(MSG)
+    assert '\n' in codec.dumps(MSG, pretty=True)
+    monkeypatch.setattr(codec, 'PRETTY', True)
+    assert '\n' in codec.dumps(MSG)
+    assert '\n' not in codec.dumps(MSG, pretty=False)
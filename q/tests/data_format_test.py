@@ -35,4 +35,34 @@ ACTUAL_WIRE_MESSAGE = """
 
 def test_is_likely_wire_format():
     assert is_likely_wire_format(ACTUAL_WIRE_MESSAGE)
-    assert is_likely_wire_format(ACTUAL_WIRE_MESSAGE.encode('utf-8'))
\ No newline at end of file
+    assert is_likely_wire_format(ACTUAL_WIRE_MESSAGE.encode('utf-8'))
+
+def test_is_likely_json_long_trailing_whitespace():
+    assert is_likely_json('{ abc }' + ' ' * 10000)
+    assert is_likely_json(b'{ abc }' + b'\n' * 10000)
+    assert not is_likely_json(b'{' + b' ' * 10000)
+    assert not is_likely_json('{')
+    assert not is_likely_json(b'  }')
+
+
+def test_wire_format_scan_limit():
+    # The key may start anywhere up to the limit, in str or bytes.
+    for pad in [WIRE_FORMAT_SCAN_LIMIT - 10, WIRE_FORMAT_SCAN_LIMIT - 9]:
+        msg = '{"iv": "' + 'x' * pad + '", "protected": "' + 'y' * 200 + '"}'
+        expected = msg.index('"protected"') <= WIRE_FORMAT_SCAN_LIMIT
+        assert is_likely_wire_format(msg) == expected
+        assert is_likely_wire_format(msg.encode('utf-8')) == expected
+
+
+def test_wire_format_needs_quoted_value():
+    msg = '{"protected": 12345, "x": "' + 'y' * 200 + '"}'
+    assert not is_likely_wire_format(msg)
+    assert not is_likely_wire_format(msg.encode('utf-8'))
+
+
+def test_huge_messages():
+    big = b'x' * (10 * 1024 * 1024)
+    assert not is_likely_json(big)
+    assert not is_likely_wire_format(b'{' + big + b'}')
+    wire = ACTUAL_WIRE_MESSAGE.encode('utf-8')
+    assert is_likely_wire_format(wire[:-3] + b', "pad": "' + big + b'"}')
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+
+from ..message_body import *
+from ..mwc import MessageWithContext
+
+WIRE_HEAD = b'{"protected": "' + b'eyJlbmMiOiJ4Y2hh' * 10 + b'", "iv": "ZqOrBZiA", "ciphertext": "'
+
+
+def _body(chunks, **kwargs):
+    body = MessageBody(**kwargs)
+    for chunk in chunks:
+        body.write(chunk)
+    return body
+
+
+def test_small_body_stays_in_memory():
+    body = _body([b'hello ', 'world'])
+    assert not body.spooled
+    assert len(body) == 11
+    assert body.read() == b'hello world'
+    assert body.head(5) == b'hello'
+    assert body.tail(5) == b'world'
+    assert body.tail(100) == b'hello world'
+
+
+def test_big_body_spools():
+    chunks = [bytes([65 + i]) * 1000 for i in range(10)]
+    body = _body(chunks, spool_threshold=4096)
+    assert body.spooled
+    assert len(body) == 10000
+    assert body.read() == b''.join(chunks)
+    assert list(body.chunks(1000)) == chunks
+    # Interleaved readers don't disturb each other.
+    a, b = body.chunks(3000), body.chunks(3000)
+    assert next(a) == next(b) == b'A' * 1000 + b'B' * 1000 + b'C' * 1000
+    assert body.head(2) == b'AA'
+    assert next(a) == next(b)
+    body.close()
+
+
+def test_spools_only_past_threshold():
+    body = _body([b'x' * 100], spool_threshold=100)
+    assert not body.spooled
+    body.write(b'y')
+    assert body.spooled
+    assert body.read() == b'x' * 100 + b'y'
+    body.close()
+
+
+def test_size_limit_enforced_per_chunk():
+    body = MessageBody(max_size=10)
+    body.write(b'x' * 6)
+    with pytest.raises(TooLarge):
+        body.write(b'x' * 6)
+    assert len(body) == 6
+    body.write(b'x' * 4)
+    assert len(body) == 10
+
+
+def test_as_bytes_and_chunks_of():
+    body = _body([b'abc'])
+    assert as_bytes(body) == b'abc'
+    assert as_bytes('abc') == b'abc'
+    assert as_bytes(b'abc') == b'abc'
+    assert b''.join(chunks_of(body, 2)) == b'abc'
+    assert list(chunks_of('abc')) == [b'abc']
+
+
+@pytest.mark.asyncio
+async def test_from_path(tmp_path):
+    fname = tmp_path / 'x'
+    fname.write_bytes(b'y' * 5000)
+    body = await MessageBody.from_path(str(fname), spool_threshold=1000, chunk_size=1024)
+    assert body.spooled and body.read() == b'y' * 5000
+    with pytest.raises(TooLarge):
+        await MessageBody.from_path(str(fname), max_size=4999)
+
+
+@pytest.mark.asyncio
+async def test_async_chunks_read_concurrently():
+    chunks = [bytes([65 + i]) * 1000 for i in range(10)]
+    body = _body(chunks, spool_threshold=4096)
+
+    async def collect():
+        return [chunk async for chunk in body.async_chunks(1000)]
+
+    # Reads run in worker threads, but each stream still sees the whole body.
+    results = await asyncio.gather(*[collect() for i in range(4)])
+    assert results == [chunks] * 4
+    body.close()
+
+
+def test_mwc_with_small_body_uses_bytes():
+    wc = MessageWithContext(_body([b'{"@id": "abc"}']))
+    assert wc.raw == b'{"@id": "abc"}'
+    assert wc.id == 'abc'
+
+
+def test_mwc_with_spooled_body():
+    ciphertext = b'K7Kxke' * 100000
+    body = _body([WIRE_HEAD, ciphertext, b'", "tag": "kAuPl8mw"}\n'], spool_threshold=64 * 1024)
+    assert body.spooled
+    wc = MessageWithContext(body)
+    assert wc.raw is body
+    assert wc.ciphertext is body
+    assert str(wc).startswith('{"protected": "eyJ')
+    assert wc.obj['iv'] == 'ZqOrBZiA'
+    assert wc.plaintext.endswith('"kAuPl8mw"}\n')
+    assert wc.get_type() is None
+    body = _body([b'{"@type": "x/1.0/y", "protected": "', ciphertext, b'"}'], spool_threshold=64 * 1024)
+    assert MessageWithContext(body).get_type() == 'x/1.0/y'
+
+
+def test_mwc_with_spooled_plaintext():
+    body = _body([b'{"@type": "x/1.0/y", "filler": "', b'z' * 100000, b'"}'], spool_threshold=1024)
+    wc = MessageWithContext(body)
+    assert wc.ciphertext is None
+    assert wc.type == 'x/1.0/y'
+    body = _body([b'not json ' * 1000], spool_threshold=1024)
+    wc = MessageWithContext(body)
+    assert wc.obj is None
+    assert wc
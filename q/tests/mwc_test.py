@@ -1,3 +1,8 @@
+import datetime
+import tracemalloc
+
+import pytest
+
 from ..mwc import *
 
 PARTIAL_TRUST = MessageTrustContext(CONFIDENTIALITY | AUTHENTICATED_ORIGIN)
@@ -54,3 +59,79 @@ def test_sender():
     assert wc.sender is None
     wc = MessageWithContext('{"sender_verkey": "abc"}')
     assert wc.sender == "abc"
+
+
+def test_lazy_obj():
+    raw = b'{"@type": "x/1.0/foo", "@id": "abc", "~thread": {"thid": "t1"}}'
+    wc = MessageWithContext(raw)
+    assert wc.tc.trust_for(DESERIALIZE_OK) is None
+    assert wc.raw is raw
+    assert wc.type == 'x/1.0/foo'
+    assert wc.id == 'abc'
+    assert wc.thid == 't1'
+    assert wc.tc.trust_for(DESERIALIZE_OK)
+
+
+def test_bad_json_denied_on_access():
+    wc = MessageWithContext(b'{"@id": }')
+    assert wc.obj is None
+    assert wc.id is None
+    assert wc.tc.trust_for(DESERIALIZE_OK) == False
+
+
+def test_not_json():
+    wc = MessageWithContext(b'hello')
+    assert wc.tc.trust_for(DESERIALIZE_OK) == False
+    assert wc.obj is None
+    assert wc.plaintext == 'hello'
+
+
+def test_plaintext_setter():
+    wc = MessageWithContext(b'hello')
+    wc.plaintext = '{"@id": "abc"}'
+    assert wc.tc.trust_for(DESERIALIZE_OK) is None
+    assert wc.id == 'abc'
+    assert wc.raw == b'hello'
+
+
+def test_NULL_MWC_is_immutable():
+    with pytest.raises(AttributeError):
+        NULL_MWC.plaintext = 'hi'
+    with pytest.raises(AttributeError):
+        NULL_MWC.interaction = object()
+    with pytest.raises(AttributeError):
+        del NULL_MWC.tc
+    with pytest.raises(TypeError):
+        NULL_MWC.tc.affirm(SIZE_OK)
+    assert not bool(NULL_MWC)
+    assert NULL_MWC.obj is None
+
+
+def test_in_time_is_utc_now():
+    before = datetime.datetime.utcnow()
+    wc = MessageWithContext('{}')
+    after = datetime.datetime.utcnow()
+    slop = datetime.timedelta(seconds=1)
+    assert before - slop <= wc.in_time <= after + slop
+    assert wc.in_time == wc.in_time
+
+
+def _bytes_per_message(payloads):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        kept = [MessageWithContext(p) for p in payloads]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return total / len(kept)
+
+
+def test_bytes_per_message():
+    # With __dict__s and a datetime per message, this was about 280.
+    n = 5000
+    assert not hasattr(MessageWithContext(b'{}'), '__dict__')
+    assert not hasattr(MessageTrustContext(), '__dict__')
+    assert _bytes_per_message([b'{"@type": "x/1.0/y", "@id": "%d"}' % i for i in range(n)]) < 200
+    assert _bytes_per_message([b'hello %d' % i for i in range(n)]) < 200
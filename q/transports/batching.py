@@ -0,0 +1,68 @@
+"""
+Helpers for the receive_batch() and send_batch() methods that transports offer.
+
+receive_batch(max_items, timeout) returns a list of up to max_items messages.
+If nothing is available right away, it waits up to timeout seconds for the
+first message to arrive (timeout=0 means don't wait; None means wait
+forever); after that, it only takes what is already available.
+
+send_batch(payloads, *args) sends each payload to the same destination and
+returns a list with the result of each send. A sender that can fail part way
+through a batch puts the exception for each payload it couldn't send in that
+list, instead of raising and leaving the caller to guess what went out.
+"""
+import asyncio
+import time
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_POLL_INTERVAL = 0.05
+
+
+def deadline_for(timeout):
+    return None if timeout is None else time.monotonic() + timeout
+
+
+def remaining(deadline):
+    return None if deadline is None else max(0, deadline - time.monotonic())
+
+
+async def poll_batch(receive, max_items, timeout=0, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Build a batch by calling receive() until it returns something empty or
+    max_items have been collected. For transports that can't wait for a
+    message any other way, poll every poll_interval seconds (up to timeout)
+    for the first one.
+    """
+    deadline = deadline_for(timeout)
+    batch = []
+    while len(batch) < max_items:
+        item = await receive()
+        if item:
+            batch.append(item)
+        elif batch:
+            break
+        else:
+            left = remaining(deadline)
+            if left is not None and left <= 0:
+                break
+            await asyncio.sleep(poll_interval if left is None else min(poll_interval, left))
+    return batch
+
+
+async def poll(take, timeout=0, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Call take() -- a coroutine function that grabs whatever batch is ready --
+    every poll_interval seconds until it returns something non-empty or timeout
+    seconds have elapsed. Return what it returned last.
+    """
+    deadline = deadline_for(timeout)
+    while True:
+        batch = await take()
+        left = remaining(deadline)
+        if batch or (left is not None and left <= 0):
+            return batch
+        await asyncio.sleep(poll_interval if left is None else min(poll_interval, left))
+
+
+async def send_each(send, payloads, *args):
+    return [await send(payload, *args) for payload in payloads]
@@ -2,7 +2,10 @@ import os
 import sys
 
 from ..dbc import precondition
+from .. import mwc
+from ..message_body import MessageBody
 from . import filesys_match
+from . import batching
 
 EXAMPLES = 'stdin|~/myfile.dat'
 
@@ -27,7 +30,7 @@ class Receiver:
     def handle(self):
         if self._handle is None:
             if self._fname == 'stdin':
-                self._handle = sys.stdin
+                self._handle = sys.stdin.buffer
             else:
                 self._handle = open(self._fname, 'rb')
         return self._handle
@@ -46,4 +49,16 @@ class Receiver:
             self._handle = None
 
     async def receive(self):
-        return self.handle.read()
\ No newline at end of file
+        """
+        Return whatever has been written since the last call, as a
+        mwc.MessageWithContext, or None if nothing has.
+        """
+        body = MessageBody.from_handle(self.handle, mwc.MAX_MESSAGE_SIZE)
+        if body:
+            return mwc.MessageWithContext(body)
+        body.close()
+
+    async def receive_batch(self, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0):
+        # A read returns everything that's available, so a batch never has
+        # more than one item.
+        return await batching.poll_batch(self.receive, 1, timeout)
\ No newline at end of file
@@ -2,6 +2,8 @@ import os
 import sys
 
 from . import filesys_match
+from . import batching
+from ..message_body import chunks_of
 
 EXAMPLES = 'stdout|~/myfile.dat'
 
@@ -19,12 +21,20 @@ class Sender:
         pass
 
     async def send(self, payload, fname, *ignored):
-        if isinstance(payload, str):
-            payload = payload.encode('utf-8')
         if fname.lower() == 'stdout':
             sys.stdout.write(fname)
             sys.stdout.flush()
         else:
             with open(fname, 'ab') as f:
-                f.write(payload)
+                f.writelines(chunks_of(payload))
                 f.flush()
+
+    async def send_batch(self, payloads, fname, *ignored):
+        if fname.lower() == 'stdout':
+            return await batching.send_each(self.send, payloads, fname)
+        # Open the file once for the whole batch.
+        with open(fname, 'ab') as f:
+            for payload in payloads:
+                f.writelines(chunks_of(payload))
+            f.flush()
+        return [None] * len(payloads)
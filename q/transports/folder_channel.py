@@ -3,6 +3,7 @@ from asyncio.coroutines import os
 from .folder_sender import Sender
 from .folder_receiver import Receiver
 from .folder_direction import Direction
+from . import batching
 
 
 class Channel(Direction):
@@ -10,7 +11,7 @@ class Channel(Direction):
     Provide a duplex channel that works by manipulating files in a folder.
     """
 
-    def __init__(self, folder: str, is_destward: bool = True):
+    def __init__(self, folder: str, is_destward: bool = True, watch: bool = True):
         """
         Claim a folder in the file system as the locus of message
         sending and receiving.
@@ -35,10 +36,16 @@ class Channel(Direction):
           http -> relay -> FolderChannel -> agent
                                               |
                Channel is srcward of the agent (read from *.in; write to *.out)
+
+        :param watch: If true (the default), keep a sorted in-memory index
+          of pending messages that is built once and then kept current by
+          watching the folder, so receiving doesn't rescan the folder, prefix
+          filters are index lookups, and new messages are noticed within
+          milliseconds. See folder_watcher.Watcher and folder_index.
         """
         Direction.__init__(self, is_destward)
         folder = os.path.normpath(os.path.abspath(folder))
-        self.receiver = Receiver(folder, is_destward)
+        self.receiver = Receiver(folder, is_destward, watch)
         self.sender = Sender(is_destward)
 
     @property
@@ -54,5 +61,17 @@ class Channel(Direction):
     async def receive(self, filter=None):
         return await self.receiver.receive(filter)
 
+    async def send_batch(self, payloads, *args):
+        return await self.sender.send_batch(payloads, self.folder)
+
+    async def receive_batch(self, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0, filter=None):
+        return await self.receiver.receive_batch(max_items, timeout, filter)
+
+    async def wait(self, timeout=None, filter=None):
+        return await self.receiver.wait(timeout, filter)
+
+    def close(self):
+        self.receiver.close()
+
     def __str__(self):
         return self.direction + '=' + self.folder
\ No newline at end of file
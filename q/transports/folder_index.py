@@ -0,0 +1,140 @@
+"""
+Keep track of the message files that are pending in a folder, in delivery order.
+
+folder_sender.Sender embeds a monotonic sequence number in the name of each
+file it writes (id.SEQ.ext), so a reader can deliver messages in the order
+they were sent, without having to stat or open anything. Files that lack a
+sequence number (e.g., files dropped into a folder by hand) are ordered by
+modification time instead.
+"""
+import bisect
+import heapq
+import os
+import threading
+import time
+
+SEQ_DIGITS = 20
+_SEQ_SEP = '.'
+
+_seq_lock = threading.Lock()
+_last_seq = 0
+
+
+def next_seq():
+    """
+    Return a sequence number that is larger than any this process has returned
+    before, and that approximates the wall-clock time in nanoseconds (so it
+    orders sensibly against sequence numbers minted by other processes).
+    """
+    global _last_seq
+    with _seq_lock:
+        seq = max(time.time_ns(), _last_seq + 1)
+        _last_seq = seq
+        return seq
+
+
+def make_fname(id, seq, ext):
+    return '%s%s%0*d%s' % (id, _SEQ_SEP, SEQ_DIGITS, seq, ext)
+
+
+def parse_seq(fname, ext):
+    """Return the sequence number embedded in fname, or None if it has none."""
+    stem = fname[:-len(ext)] if ext else fname
+    _, sep, digits = stem.rpartition(_SEQ_SEP)
+    if sep and len(digits) == SEQ_DIGITS and digits.isdigit():
+        return int(digits)
+
+
+def seq_for(fname, ext, folder=None, entry=None):
+    """
+    Return the ordering key for a message file: its embedded sequence number
+    if it has one, else its modification time in nanoseconds. Return None if
+    the file has no sequence number and has disappeared.
+    """
+    seq = parse_seq(fname, ext)
+    if seq is None:
+        try:
+            st = entry.stat() if entry is not None else os.stat(os.path.join(folder, fname))
+        except FileNotFoundError:
+            return None
+        seq = st.st_mtime_ns
+    return seq
+
+
+class FolderIndex:
+    """
+    An in-memory index of pending message file names. Unfiltered pops come off
+    a heap ordered by (seq, name), so add, remove and pop are O(log n) and FIFO
+    (removed names are dropped from the heap lazily). Prefix lookups (filters)
+    bisect a sorted list of names instead of scanning; that list is only built
+    once a filter is first used, and keeping it sorted makes add and remove
+    O(n) from then on (a memmove, so still cheap for any realistic folder).
+    """
+
+    def __init__(self):
+        self._seqs = {}
+        self._heap = []
+        self._names = None
+
+    def __len__(self):
+        return len(self._seqs)
+
+    def __iter__(self):
+        return iter(self._seqs)
+
+    def __contains__(self, fname):
+        return fname in self._seqs
+
+    def add(self, fname, seq):
+        if fname not in self._seqs:
+            self._seqs[fname] = seq
+            heapq.heappush(self._heap, (seq, fname))
+            if self._names is not None:
+                bisect.insort(self._names, fname)
+
+    def remove(self, fname):
+        if fname in self._seqs:
+            del self._seqs[fname]
+            if self._names is not None:
+                i = bisect.bisect_left(self._names, fname)
+                del self._names[i]
+            # The heap entry is discarded lazily, when it reaches the top.
+            if len(self._heap) > 2 * len(self._seqs) + 64:
+                self._heap = [(s, n) for (s, n) in self._heap if self._seqs.get(n) == s]
+                heapq.heapify(self._heap)
+
+    def clear(self):
+        self._seqs.clear()
+        self._heap.clear()
+        self._names = None
+
+    def _head(self):
+        heap = self._heap
+        while heap:
+            seq, fname = heap[0]
+            if self._seqs.get(fname) == seq:
+                return fname
+            heapq.heappop(heap)
+
+    def peek(self, filter=None):
+        """Return the first pending name in delivery order (that starts with filter), or None."""
+        if not filter:
+            return self._head()
+        if self._names is None:
+            self._names = sorted(self._seqs)
+        names = self._names
+        i = bisect.bisect_left(names, filter)
+        best = None
+        best_seq = None
+        while i < len(names) and names[i].startswith(filter):
+            seq = self._seqs[names[i]]
+            if best is None or (seq, names[i]) < (best_seq, best):
+                best, best_seq = names[i], seq
+            i += 1
+        return best
+
+    def pop(self, filter=None):
+        fname = self.peek(filter)
+        if fname is not None:
+            self.remove(fname)
+        return fname
@@ -1,34 +1,64 @@
-import aiofiles
+import asyncio
 from asyncio.coroutines import os
+import logging
+import time
 
 from .folder_direction import Direction
+from .folder_watcher import Watcher, DEFAULT_POLL_INTERVAL
+from . import folder_index
+from . import batching
 from . import filesys_match
 from .. import mwc
+from ..message_body import MessageBody, TooLarge
 from .. import log_helpers
 from ..dbc import precondition
 
 EXAMPLES = '~/myfolder'
 _MSG_EXT = '.in'
+# Appended to the name of a message file that's too big to read.
+_TOO_LARGE_EXT = '.too-large'
 
 
 def match(uri):
     return filesys_match.match_uri_to_filesys(uri, os.path.isdir)
 
 def _next_item_name(folder, ext, filter=None):
-    for root, folders, files in os.walk(folder):
-        folders.clear()
-        for fname in files:
+    """
+    Yield the name of the next message file in delivery order, or nothing if
+    there isn't one. This scans the whole folder; a watching Receiver uses
+    its index instead.
+    """
+    best = None
+    best_seq = None
+    with os.scandir(folder) as it:
+        for entry in it:
+            fname = entry.name
             # Ignore files that are not messages.
-            if fname.endswith(ext):
+            if fname.endswith(ext) and not fname.startswith('.'):
                 if (filter is None) or (fname.startswith(filter)):
-                    yield fname
+                    seq = folder_index.seq_for(fname, ext, entry=entry)
+                    if seq is not None and (best is None or (seq, fname) < (best_seq, best)):
+                        best, best_seq = fname, seq
+    if best is not None:
+        yield best
 
 
 async def _pop_item(fpath):
-    async with aiofiles.open(fpath, 'rb') as f:
-        data = await f.read()
+    """
+    Read and remove the message file at fpath. If reading fails (or is
+    cancelled), the file stays where it is, to be tried again--unless it's
+    too big ever to be read, in which case it's renamed out of the way.
+    """
+    try:
+        # Big messages are spooled, and oversized ones abandoned early.
+        body = await MessageBody.from_path(fpath, mwc.MAX_MESSAGE_SIZE)
+    except TooLarge:
+        os.rename(fpath, fpath + _TOO_LARGE_EXT)
+        logging.error('%s exceeds %d bytes; renamed it to %s%s.' % (
+            fpath, mwc.MAX_MESSAGE_SIZE, fpath, _TOO_LARGE_EXT))
+        raise
     os.remove(fpath)
-    return data
+    return body
 
 
 async def _item_content(folder, ext, filter=None):
@@ -44,12 +74,46 @@ async def _item_content(folder, ext, filter=None):
         log_helpers.log_exception()
 
 
+async def _watched_item_content(watcher, filter=None):
+    """Like _item_content, but take names from a Watcher instead of scanning."""
+    try:
+        while True:
+            fname = watcher.pop(filter)
+            if fname is None:
+                return None
+            try:
+                data = await _pop_item(os.path.join(watcher.folder, fname))
+            except (FileNotFoundError, TooLarge):
+                # Somebody else consumed the file before we got to it, or
+                # it has been set aside.
+                continue
+            except BaseException:
+                # The file is still there; make sure it's tried again.
+                watcher.requeue(fname)
+                raise
+            return mwc.MessageWithContext(data)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        raise
+    except:
+        log_helpers.log_exception()
+
+
 class Receiver(Direction):
-    def __init__(self, uri, is_destward=False):
+    def __init__(self, uri, is_destward=False, watch=True):
+        """
+        :param uri: Folder to read message files from. It must exist.
+        :param is_destward: See folder_channel.Channel.
+        :param watch: If true (the default), index the folder's message files
+          once, keep the index current by watching the folder (inotify on
+          Linux, with a polling fallback), and deliver from the index instead
+          of scanning the folder on every call. Either way, messages are
+          delivered in the order they were sent.
+        """
         Direction.__init__(self, is_destward)
         folder = os.path.expanduser(uri)
         precondition(os.path.isdir(folder), "Folder %s must exist." % uri)
         self._folder = os.path.normpath(folder)
+        self._watcher = Watcher(self._folder, self.read_ext) if watch else None
 
     @property
     def endpoint(self):
@@ -59,9 +123,51 @@ class Receiver(Direction):
     def folder(self):
         return self._folder
 
+    @property
+    def watching(self):
+        return self._watcher is not None
+
     async def peek(self, filter=None):
+        if self._watcher is not None:
+            return self._watcher.peek(filter) is not None
         for x in _next_item_name(self._folder, self.read_ext, filter):
             return True
 
     async def receive(self, filter=None):
+        if self._watcher is not None:
+            return await _watched_item_content(self._watcher, filter)
         return await _item_content(self._folder, self.read_ext, filter)
+
+    async def wait(self, timeout=None, filter=None):
+        """
+        Wait up to timeout seconds (forever if None) for a message to become
+        available. Return True if one is ready.
+        """
+        if self._watcher is not None:
+            return await self._watcher.wait(timeout, filter)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not await self.peek(filter):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            await asyncio.sleep(DEFAULT_POLL_INTERVAL if remaining is None
+                                else min(DEFAULT_POLL_INTERVAL, remaining))
+        return True
+
+    async def receive_batch(self, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0, filter=None):
+        """
+        Return a list of up to max_items messages, waiting up to timeout
+        seconds for the first one if none is ready.
+        """
+        batch = []
+        if await self.wait(timeout, filter):
+            while len(batch) < max_items:
+                wc = await self.receive(filter)
+                if not wc:
+                    break
+                batch.append(wc)
+        return batch
+
+    def close(self):
+        if self._watcher is not None:
+            self._watcher.close()
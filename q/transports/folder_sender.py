@@ -3,8 +3,11 @@ import os
 import uuid
 
 from .folder_direction import Direction
+from . import folder_index
+from . import batching
 from . import filesys_match
 from ..dbc import precondition
+from ..message_body import chunks_of
 
 EXAMPLES = '~/myfolder'
 
@@ -20,17 +23,22 @@ class Sender(Direction):
     async def send(self, payload, folder, id=None, *args):
         folder = os.path.expanduser(folder)
         precondition(os.path.isdir(folder), "Folder %s must exist." % folder)
-        if isinstance(payload, str):
-            payload = payload.encode('utf-8')
         if id is None:
             id = str(uuid.uuid4())
         # Because writing is not an atomic operation, create the file with
         # a temp name, then rename it once the file has been written and
         # closed. This prevents code from peeking/reading the file before
-        # we are done writing it.
+        # we are done writing it. The permanent name carries a sequence
+        # number, so readers can deliver messages in the order we sent them.
+        seq = folder_index.next_seq()
         temp_fname = os.path.join(folder, '.' + id + '.tmp')
-        perm_fname = os.path.join(folder, id + self.write_ext)
+        perm_fname = os.path.join(folder, folder_index.make_fname(id, seq, self.write_ext))
         async with aiofiles.open(temp_fname, 'wb') as f:
-            await f.write(payload)
+            for chunk in chunks_of(payload):
+                await f.write(chunk)
         os.rename(temp_fname, perm_fname)
         return id
+
+    async def send_batch(self, payloads, folder, *args):
+        """Write each payload as its own message file; return their ids."""
+        return await batching.send_each(self.send, payloads, folder)
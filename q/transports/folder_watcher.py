@@ -0,0 +1,234 @@
+"""
+Watch a folder for message files, so receivers don't have to rescan it
+every time they want the next message.
+
+On Linux, the watcher uses inotify to learn about files as soon as they are
+renamed into place or closed after writing. Elsewhere (or if inotify can't
+be initialized), it falls back to rescanning the folder -- but only when its
+in-memory queue can't satisfy a request, or while a caller is waiting.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+
+from .folder_index import FolderIndex, seq_for
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_MOVED_FROM | _IN_DELETE
+_ADDED_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+DEFAULT_POLL_INTERVAL = 0.25
+
+
+def _load_inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        # Touch the functions so we fail here rather than on first use.
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_inotify()
+
+
+def _open_inotify(folder):
+    """Return an inotify file descriptor watching folder, or None if unavailable."""
+    if _libc is None:
+        return None
+    fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:
+        return None
+    wd = _libc.inotify_add_watch(fd, os.fsencode(folder), _WATCH_MASK)
+    if wd < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _parse_events(buf):
+    """Yield (mask, name) for each event in a buffer read from an inotify fd."""
+    i = 0
+    end = len(buf)
+    while i + _EVENT_HEADER.size <= end:
+        _, mask, _, name_len = _EVENT_HEADER.unpack_from(buf, i)
+        i += _EVENT_HEADER.size
+        name = buf[i:i + name_len].rstrip(b'\0')
+        i += name_len
+        yield mask, os.fsdecode(name)
+
+
+class Watcher:
+    """
+    Keep an in-memory index (see folder_index.FolderIndex) of the names of
+    message files (files ending with ext) that are ready to be read from a
+    folder. The index is built once, from a single scan, when the watcher
+    starts; after that, it is kept current by inotify events.
+    """
+
+    def __init__(self, folder: str, ext: str, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 use_inotify: bool = True):
+        self.folder = folder
+        self.ext = ext
+        self.poll_interval = poll_interval
+        self._use_inotify = use_inotify
+        self._ready = FolderIndex()
+        self._fd = None
+        self._started = False
+        # While anyone is waiting: a future that the event loop completes when
+        # the inotify fd becomes readable. All waiters share it, because the
+        # loop allows only one reader per fd.
+        self._readable = None
+        self._loop = None
+
+    @property
+    def uses_inotify(self):
+        return self._fd is not None
+
+    def _wants(self, fname):
+        return fname.endswith(self.ext) and not fname.startswith('.')
+
+    def _scan(self):
+        seen = set()
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                fname = entry.name
+                if self._wants(fname):
+                    seen.add(fname)
+                    if fname not in self._ready:
+                        seq = seq_for(fname, self.ext, entry=entry)
+                        if seq is not None:
+                            self._ready.add(fname, seq)
+        if len(seen) != len(self._ready):
+            for fname in [x for x in self._ready if x not in seen]:
+                self._ready.remove(fname)
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            # Open the watch before the initial scan, so nothing that arrives
+            # in between can slip through the cracks.
+            if self._use_inotify:
+                self._fd = _open_inotify(self.folder)
+            self._scan()
+
+    def close(self):
+        if self._readable is not None and not self._readable.done():
+            self._loop.remove_reader(self._fd)
+            self._readable.cancel()
+        self._readable = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._started = False
+        self._ready.clear()
+
+    def __del__(self):
+        if self._fd is not None:
+            os.close(self._fd)
+
+    def _drain_events(self):
+        """Apply any pending inotify events to the ready queue without blocking."""
+        while True:
+            try:
+                buf = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                return
+            if not buf:
+                return
+            for mask, fname in _parse_events(buf):
+                if mask & _IN_Q_OVERFLOW:
+                    self._scan()
+                elif self._wants(fname):
+                    if mask & _ADDED_MASK:
+                        seq = seq_for(fname, self.ext, folder=self.folder)
+                        if seq is not None:
+                            self._ready.add(fname, seq)
+                    else:
+                        self._ready.remove(fname)
+
+    def peek(self, filter=None):
+        """Return the name of the next ready file (matching filter), or None."""
+        self.start()
+        if self._fd is not None:
+            self._drain_events()
+        fname = self._ready.peek(filter)
+        if fname is None and self._fd is None:
+            self._scan()
+            fname = self._ready.peek(filter)
+        return fname
+
+    def pop(self, filter=None):
+        """Remove the name of the next ready file (matching filter) from the queue and return it."""
+        fname = self.peek(filter)
+        if fname is not None:
+            self._ready.remove(fname)
+        return fname
+
+    def requeue(self, fname):
+        """Put back a name that was pop()ped but couldn't be read, so it's tried again."""
+        if self._started and self._wants(fname):
+            seq = seq_for(fname, self.ext, folder=self.folder)
+            if seq is not None:
+                self._ready.add(fname, seq)
+
+    def __len__(self):
+        return len(self._ready)
+
+    def _when_readable(self, loop):
+        """Return a future that completes when the inotify fd has events to read."""
+        if self._readable is None or self._readable.done():
+            readable = loop.create_future()
+
+            def on_readable():
+                loop.remove_reader(self._fd)
+                if not readable.done():
+                    readable.set_result(True)
+
+            loop.add_reader(self._fd, on_readable)
+            self._readable = readable
+            self._loop = loop
+        return self._readable
+
+    async def wait(self, timeout=None, filter=None):
+        """
+        Wait until a file (matching filter) is ready, or until timeout seconds
+        have elapsed. Return True if something is ready.
+        """
+        if self.peek(filter) is not None:
+            return True
+        if timeout is not None and timeout <= 0:
+            return False
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if self._fd is not None:
+                try:
+                    # Shielded, so one waiter giving up doesn't wake the others.
+                    await asyncio.wait_for(asyncio.shield(self._when_readable(loop)), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                delay = self.poll_interval if remaining is None else min(self.poll_interval, remaining)
+                await asyncio.sleep(delay)
+            if self.peek(filter) is not None:
+                return True
@@ -0,0 +1,88 @@
+"""
+Length-prefixed framing for stream transports (tcp://, unix://).
+
+Each message on the wire is a 4-byte big-endian length followed by that many
+bytes of payload, so a reader always knows where one message ends and the
+next begins, no matter how the stream happens to be chunked.
+"""
+import asyncio
+import struct
+
+from ..mwc import MAX_MESSAGE_SIZE
+from ..message_body import as_bytes
+
+HEADER = struct.Struct('!I')
+READ_SIZE = 64 * 1024
+
+
+class FrameTooLarge(ValueError):
+    pass
+
+
+def frame(payload, max_size=MAX_MESSAGE_SIZE) -> bytes:
+    """Return payload (bytes, str or MessageBody) with a length prefix."""
+    payload = as_bytes(payload)
+    if len(payload) > max_size:
+        raise FrameTooLarge('Message size %d exceeds %d.' % (len(payload), max_size))
+    return HEADER.pack(len(payload)) + payload
+
+
+class Decoder:
+    """
+    Accumulate bytes from a stream and split them into frames. Incoming chunks
+    are appended to a single bytearray; each complete frame is copied out of it
+    exactly once, and consumed bytes are discarded in bulk rather than per frame.
+    """
+    def __init__(self, max_size=MAX_MESSAGE_SIZE):
+        self.max_size = max_size
+        self._buf = bytearray()
+        self._pos = 0
+
+    def __len__(self):
+        """How many bytes are buffered but not yet returned as frames."""
+        return len(self._buf) - self._pos
+
+    def feed(self, data):
+        self._buf += data
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Return the next complete frame, or raise StopIteration if there isn't one yet."""
+        buf = self._buf
+        pos = self._pos
+        if len(buf) - pos >= HEADER.size:
+            size = HEADER.unpack_from(buf, pos)[0]
+            if size > self.max_size:
+                raise FrameTooLarge('Message size %d exceeds %d.' % (size, self.max_size))
+            start = pos + HEADER.size
+            end = start + size
+            if end <= len(buf):
+                with memoryview(buf) as view:
+                    payload = bytes(view[start:end])
+                self._pos = end
+                return payload
+        # Out of complete frames; drop what we've consumed.
+        if pos:
+            del buf[:pos]
+            self._pos = 0
+        raise StopIteration
+
+
+async def read_frames(reader, max_size=MAX_MESSAGE_SIZE):
+    """
+    Yield each frame that arrives on an asyncio.StreamReader, until the stream
+    ends. Raise FrameTooLarge if the peer announces an oversized frame, and
+    asyncio.IncompleteReadError if the stream ends in the middle of a frame.
+    """
+    decoder = Decoder(max_size)
+    while True:
+        chunk = await reader.read(READ_SIZE)
+        if not chunk:
+            if len(decoder):
+                raise asyncio.IncompleteReadError(b'', None)
+            return
+        decoder.feed(chunk)
+        for payload in decoder:
+            yield payload
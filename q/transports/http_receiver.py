@@ -1,25 +1,48 @@
 from aiohttp import web
+import asyncio
 import traceback
 import re
-import threading
 import logging
+import urllib.parse
 
 from .. import mwc
+from ..message_body import MessageBody, TooLarge
+from .ingress_queue import QueuedReceiver
 
-_PAT = re.compile('^http(s)?://([^:/]+)(?::([0-9]{1,5}))?(?:/(.*))?$')
-EXAMPLES = 'http://localhost:8080'
+_PAT = re.compile('^http(s)?://([^:/?]+)(?::([0-9]{1,5}))?(?:/([^?]*))?(?:[?](.*))?$')
+EXAMPLES = 'http://localhost:8080|http://localhost:8080?max_queue=100'
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_RETRY_AFTER = 1
 
 
 def match(uri):
     return bool(_PAT.match(uri))
 
 
-def _resp(code, msg):
-    return web.Response(text='%d %s' % (code, msg), headers={"Content-Type": "text/plain"})
+def _resp(code, msg, headers=None):
+    all_headers = {"Content-Type": "text/plain"}
+    if headers:
+        all_headers.update(headers)
+    return web.Response(status=code, text='%d %s' % (code, msg), headers=all_headers)
 
 
-class Receiver:
-    def __init__(self, uri):
+def _int_param(params, name, default):
+    values = params.get(name)
+    return int(values[-1]) if values else default
+
+
+class Receiver(QueuedReceiver):
+    def __init__(self, uri, max_queue=None, retry_after=None):
+        """
+        :param uri: Where to listen, like http://localhost:8080. The query
+          string can set max_queue and retry_after, as in
+          http://localhost:8080?max_queue=100&retry_after=2.
+        :param max_queue: How many received messages to hold for the consumer.
+          When this many are waiting, further POSTs are answered with 503 and
+          a Retry-After header. Overrides the value in the uri, if any.
+        :param retry_after: Seconds that rejected senders are asked to wait
+          before trying again.
+        """
         m = _PAT.match(uri)
         if m.group(1) == 's':
             raise ValueError("Can't listen over TLS (no certs available).")
@@ -28,19 +51,46 @@ class Receiver:
         self.port = int(m.group(3))
         if m.group(4):
             raise ValueError("Can't bind to a path--only to host and port.")
-        self.queue = []
-        self.queue_lock = threading.Lock()
+        params = urllib.parse.parse_qs(m.group(5) or '')
+        if max_queue is None:
+            max_queue = _int_param(params, 'max_queue', DEFAULT_MAX_QUEUE)
+        if retry_after is None:
+            retry_after = _int_param(params, 'retry_after', DEFAULT_RETRY_AFTER)
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._init_ingress(max_queue)
         self.web_server = None
         self.endpoint = uri
 
+    def _reject(self):
+        self.stats.rejected += 1
+        logging.warning('Rejecting POST; %d messages already queued.' % self.depth)
+        return _resp(503, 'Queue full; try again later',
+                     {'Retry-After': str(self.retry_after)})
+
+    def _too_large(self):
+        self.stats.rejected += 1
+        return _resp(413, 'Message exceeds %d bytes' % mwc.MAX_MESSAGE_SIZE)
+
     async def accept(self, request):
         try:
             if request.body_exists:
+                # Don't bother reading a body we'll have no room for.
+                if self.queue.full():
+                    return self._reject()
+                if (request.content_length or 0) > mwc.MAX_MESSAGE_SIZE:
+                    return self._too_large()
                 logging.debug('About to await request')
-                txt = await request.content.read()
+                try:
+                    body = await MessageBody.from_stream(request.content, mwc.MAX_MESSAGE_SIZE)
+                except TooLarge:
+                    return self._too_large()
                 logging.debug('Responding to %s' % request.method)
-                with self.queue_lock:
-                    self.queue.append(mwc.MessageWithContext(txt))
+                try:
+                    self._enqueue_nowait(mwc.MessageWithContext(body))
+                except asyncio.QueueFull:
+                    body.close()
+                    return self._reject()
                 return _resp(202, 'OK')
             else:
                 return _resp(400, 'No useful payload. Expected msg from form or query string')
@@ -51,7 +101,7 @@ class Receiver:
     async def start(self):
         logging.debug('About to start web server on port %d' % self.port)
         app = web.Application()
-        app.add_routes([web.post('/', self.accept)])
+        app.add_routes([web.post('/', self.accept), web.get('/stats', self.report)])
         self.web_server = web.AppRunner(app)
         await self.web_server.setup()
         site = web.TCPSite(self.web_server, 'localhost', self.port)
@@ -62,22 +112,23 @@ class Receiver:
             ex = traceback.format_exc()
             logging.debug('Failed to start web server. ' + ex)
 
+    async def report(self, request):
+        report = self.stats.as_dict()
+        report['depth'] = self.depth
+        report['max_queue'] = self.max_queue
+        return web.json_response(report)
+
     async def stop(self):
-        with self.queue_lock:
-            if self.web_server:
-                await self.web_server.cleanup()
-                self.web_server = None
+        if self.web_server:
+            web_server = self.web_server
+            self.web_server = None
+            await web_server.cleanup()
+
+    async def _ensure_started(self):
+        if not self.web_server:
+            await self.start()
 
     async def peek(self):
-        with self.queue_lock:
-            if not self.web_server:
-                await self.start()
-            if self.queue:
-                return True
-
-    async def receive(self):
-        with self.queue_lock:
-            if not self.web_server:
-                await self.start()
-            if self.queue:
-                return self.queue.pop(0)
+        await self._ensure_started()
+        if not self.queue.empty():
+            return True
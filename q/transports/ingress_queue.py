@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from . import batching
+from .ingress_stats import IngressStats
+
+
+class QueuedReceiver:
+    """
+    Base for receivers whose server code puts messages on a bounded
+    asyncio.Queue for the consumer to take off. Subclasses call
+    _init_ingress() from their constructor, and can override _ensure_started()
+    if their start() isn't safe to call more than once.
+    """
+
+    def _init_ingress(self, max_queue):
+        self.stats = IngressStats()
+        # Items are (time queued, message) tuples, so we can tell how long
+        # messages wait for the consumer.
+        self.queue = asyncio.Queue(max_queue)
+
+    @property
+    def depth(self):
+        """How many messages are waiting for the consumer."""
+        return self.queue.qsize()
+
+    async def _enqueue(self, wc):
+        """Queue a message, waiting for room if the consumer is behind."""
+        await self.queue.put((time.monotonic(), wc))
+        self.stats.accepted += 1
+
+    def _enqueue_nowait(self, wc):
+        """Queue a message; raise asyncio.QueueFull if there's no room."""
+        self.queue.put_nowait((time.monotonic(), wc))
+        self.stats.accepted += 1
+
+    async def _ensure_started(self):
+        await self.start()
+
+    async def receive(self, timeout=0):
+        """
+        Return the next message, waiting up to timeout seconds (forever if
+        None) for one to arrive. Return None if nothing arrives in time.
+        """
+        await self._ensure_started()
+        if timeout is not None and timeout <= 0:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return None
+        else:
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._deliver(item)
+
+    def _deliver(self, item):
+        queued_at, wc = item
+        self.stats.record_delivery(queued_at)
+        return wc
+
+    async def receive_batch(self, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0):
+        """
+        Return a list of up to max_items messages, waiting up to timeout
+        seconds for the first one if none is ready.
+        """
+        batch = []
+        first = await self.receive(timeout)
+        if first is not None:
+            batch.append(first)
+            while len(batch) < max_items:
+                try:
+                    batch.append(self._deliver(self.queue.get_nowait()))
+                except asyncio.QueueEmpty:
+                    break
+        return batch
@@ -0,0 +1,39 @@
+import time
+
+
+class IngressStats:
+    """
+    Describe how well the consumer of a Receiver is keeping up with what is
+    posted to it. Waits are measured from when a message is queued to when it
+    is handed to the consumer.
+    """
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.delivered = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_delivery(self, queued_at):
+        wait = time.monotonic() - queued_at
+        self.delivered += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    @property
+    def mean_wait(self):
+        return self.total_wait / self.delivered if self.delivered else 0.0
+
+    def as_dict(self):
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'delivered': self.delivered,
+            'mean_wait': self.mean_wait,
+            'max_wait': self.max_wait
+        }
+
+    def __str__(self):
+        return 'accepted=%d, rejected=%d, delivered=%d, mean_wait=%.3fs, max_wait=%.3fs' % (
+            self.accepted, self.rejected, self.delivered, self.mean_wait, self.max_wait)
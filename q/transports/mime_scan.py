@@ -0,0 +1,113 @@
+"""
+Find the parts of a MIME message without parsing the whole thing.
+
+email.message_from_bytes() builds a Message object for every part of an
+email, decoding headers and copying bodies as it goes. When all we want is
+one attachment, that is wasted work -- and wasted memory, if the email also
+carries large attachments we don't care about. The functions here parse only
+headers, and locate part bodies by searching the raw bytes for multipart
+boundaries; the caller decides which part (if any) deserves a full parse.
+"""
+import email
+import email.message
+import email.parser
+
+_header_parser = email.parser.BytesHeaderParser()
+
+
+class Unparseable(Exception):
+    """Raised for structures we don't try to scan; callers should parse the message normally."""
+    pass
+
+
+class Part:
+    """
+    A leaf (non-multipart) part of a message: its parsed headers, plus the
+    offsets in the raw message where the part (headers and body) starts and ends.
+    """
+    def __init__(self, data, headers, start, end):
+        self.data = data
+        self.headers = headers
+        self.start = start
+        self.end = end
+
+    def message(self) -> email.message.Message:
+        """Parse just this part, as if it were a message on its own."""
+        return email.message_from_bytes(self.data[self.start:self.end])
+
+
+def _header_end(data, start, end):
+    """Return the offset where the body starts, in the entity at data[start:end]."""
+    if data.startswith(b'\n', start) or data.startswith(b'\r\n', start):
+        # No headers at all.
+        return data.index(b'\n', start) + 1
+    i = data.find(b'\n\n', start, end)
+    j = data.find(b'\n\r\n', start, end)
+    if j >= 0 and (i < 0 or j < i):
+        return j + 3
+    if i >= 0:
+        return i + 2
+    return end
+
+
+def _find_delimiter(data, delim, start, end):
+    """Return the offset of the next line in data[start:end] that starts with delim, or -1."""
+    if data.startswith(delim, start):
+        return start
+    i = data.find(b'\n' + delim, start, end)
+    return i + 1 if i >= 0 else -1
+
+
+def _iter_bodies(data, start, end, boundary):
+    """Yield (start, end) for each body part of the multipart body in data[start:end]."""
+    delim = b'--' + boundary
+    i = _find_delimiter(data, delim, start, end)
+    if i < 0:
+        raise Unparseable('Missing boundary')
+    while True:
+        after = i + len(delim)
+        if data.startswith(b'--', after):
+            return
+        line_end = data.find(b'\n', after, end)
+        if line_end < 0:
+            raise Unparseable('Truncated multipart')
+        part_start = line_end + 1
+        i = _find_delimiter(data, delim, part_start, end)
+        if i < 0:
+            raise Unparseable('Missing close delimiter')
+        # The line break before a delimiter belongs to the delimiter.
+        part_end = max(part_start, i - 1)
+        if part_end > part_start and data[part_end - 1] == 13: # \r
+            part_end -= 1
+        yield part_start, part_end
+
+
+def _scan(data, start, end, headers):
+    maintype = headers.get_content_maintype()
+    if maintype == 'multipart':
+        boundary = headers.get_boundary()
+        if not boundary:
+            raise Unparseable('Multipart without boundary')
+        body_start = _header_end(data, start, end)
+        for part_start, part_end in _iter_bodies(data, body_start, end, boundary.encode('ascii')):
+            part_headers = _header_parser.parsebytes(data[part_start:_header_end(data, part_start, part_end)])
+            yield from _scan(data, part_start, part_end, part_headers)
+    elif maintype == 'message':
+        # Forwarded messages are rare enough that we let the full parser handle them.
+        raise Unparseable('Embedded message')
+    else:
+        yield Part(data, headers, start, end)
+
+
+def leaf_parts(data: bytes):
+    """
+    Yield a Part for each leaf of the MIME tree in data, in the same order as
+    email.message.Message.walk(). Raise Unparseable if the message has a
+    structure that should be left to the full parser.
+    """
+    end = len(data)
+    try:
+        headers = _header_parser.parsebytes(data[:_header_end(data, 0, end)])
+        yield from _scan(data, 0, end, headers)
+    except (UnicodeError, ValueError) as e:
+        raise Unparseable(str(e))
@@ -1,47 +1,123 @@
+import asyncio
+import collections
 import threading
 import weakref
 
-_all = {}
+from . import batching
+
+# Named queues, shared by every RamTransport with the same name for as long
+# as any of them is alive.
+_all = weakref.WeakValueDictionary()
 _all_lock = threading.Lock()
 
 
 class Queue:
-    def __init__(self, name):
+    """
+    An in-process FIFO for coroutines. Items live in a deque; an
+    asyncio.Condition wakes receivers waiting for items and senders waiting
+    for room, so nobody has to poll. A queue is bound to the event loop that
+    first waits on it, and isn't meant to be shared across threads.
+    """
+
+    def __init__(self, name, capacity=0):
+        """
+        :param capacity: Max number of items to hold; 0 means unbounded. When
+          the queue is full, send() waits for room.
+        """
         self.name = name
-        self.lock = threading.Lock()
-        self.items = []
-        with _all_lock:
-            _all[name] = self
-
-    async def send(self, payload):
-        # Adds element to the end of queue
-        with self.lock:
-            self.items.append(payload)
+        self.capacity = capacity
+        self.items = collections.deque()
+        self._changed = asyncio.Condition()
+        self._waiting = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def full(self):
+        return bool(self.capacity) and len(self.items) >= self.capacity
+
+    async def _wait(self, predicate, timeout):
+        """Wait up to timeout seconds (forever if None) for predicate() to be true."""
+        if predicate():
+            return True
+        if timeout is not None and timeout <= 0:
+            return False
+        self._waiting += 1
+        try:
+            async with self._changed:
+                await asyncio.wait_for(self._changed.wait_for(predicate), timeout)
             return True
+        except asyncio.TimeoutError:
+            return bool(predicate())
+        finally:
+            self._waiting -= 1
+
+    async def _notify(self):
+        # Only pay for the condition's lock when someone is actually waiting.
+        if self._waiting:
+            async with self._changed:
+                self._changed.notify_all()
+
+    def _has_room(self):
+        return not self.full()
+
+    async def send(self, payload, timeout=None):
+        """
+        Add payload to the end of the queue, waiting up to timeout seconds
+        (forever if None) for room. Return False if there was no room in time.
+        """
+        if not await self._wait(self._has_room, timeout):
+            return False
+        self.items.append(payload)
+        await self._notify()
+        return True
 
     async def peek(self, filter=None):
-        with self.lock:
-            if self.items:
-                return True
+        if self.items:
+            return True
+
+    async def receive(self, filter=None, timeout=0):
+        """
+        Remove and return the item at the front of the queue, waiting up to
+        timeout seconds (forever if None) for one to arrive. Return None if
+        nothing arrives in time.
+        """
+        if not await self._wait(lambda: self.items, timeout):
+            return None
+        item = self.items.popleft()
+        await self._notify()
+        return item
+
+    async def send_batch(self, payloads, timeout=None):
+        if not self.capacity:
+            self.items.extend(payloads)
+            await self._notify()
+            return [True] * len(payloads)
+        return [await self.send(payload, timeout) for payload in payloads]
 
-    async def receive(self, filter=None):
-        # Removes element from beginning of the queue
-        with self.lock:
-            if self.items:
-                return self.items.pop(0)
+    async def receive_batch(self, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0):
+        if not await self._wait(lambda: self.items, timeout):
+            return []
+        items = self.items
+        batch = [items.popleft() for i in range(min(max_items, len(items)))]
+        await self._notify()
+        return batch
+
+
+def get_queue(name, capacity=0):
+    """Return the queue with this name, creating it if nobody is using one."""
+    with _all_lock:
+        queue = _all.get(name)
+        if queue is None:
+            queue = Queue(name, capacity)
+            _all[name] = queue
+        return queue
 
 
 class RamTransport:
 
-    def __init__(self, name):
-        self.queue = None
-        with _all_lock:
-            if name in _all:
-                self.queue = _all[name]()
-        if self.queue is None:
-            self.queue = Queue(name)
-            with _all_lock:
-                _all[name] = weakref.ref(self.queue)
+    def __init__(self, name, capacity=0):
+        self.queue = get_queue(name, capacity)
         self.endpoint = 'ram://' + name
 
     async def send(self, payload, endpoint):
@@ -50,5 +126,11 @@ class RamTransport:
     async def peek(self, filter=None):
         return await self.queue.peek(filter)
 
-    async def receive(self, filter=None):
-        return await self.queue.receive(filter)
+    async def receive(self, filter=None, timeout=0):
+        return await self.queue.receive(filter, timeout)
+
+    async def send_batch(self, payloads, endpoint):
+        return await self.queue.send_batch(payloads)
+
+    async def receive_batch(self, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0):
+        return await self.queue.receive_batch(max_items, timeout)
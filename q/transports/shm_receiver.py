@@ -0,0 +1,94 @@
+import asyncio
+import re
+import urllib.parse
+
+from .. import mwc
+from . import batching
+from . import shm_ring
+
+_PAT = re.compile('^shm://([A-Za-z0-9_.-]{1,200})(?:[?](.*))?$')
+EXAMPLES = 'shm://myagent|shm://myagent?capacity=4194304'
+
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+class Receiver:
+    """
+    Receive messages that other processes on this host put in a shared-memory
+    ring (see shm_ring.py). The receiver creates the ring when it starts, and
+    wakes up as soon as a sender rings the doorbell, so nothing polls.
+    """
+
+    def __init__(self, uri, capacity=None):
+        """
+        :param uri: Like shm://myagent. The query string can set capacity
+          (the size of the ring in bytes), as in shm://myagent?capacity=4194304.
+        """
+        m = _PAT.match(uri)
+        self.name = m.group(1)
+        params = urllib.parse.parse_qs(m.group(2) or '')
+        if capacity is None:
+            capacity = int(params.get('capacity', [shm_ring.DEFAULT_CAPACITY])[-1])
+        self.capacity = capacity
+        self.endpoint = 'shm://' + self.name
+        self._ring = None
+        self._doorbell = None
+        self._rung = None
+
+    async def start(self):
+        if self._ring is None:
+            self._ring = shm_ring.Ring.create(self.name, self.capacity)
+            self._doorbell = shm_ring.Doorbell(self.name)
+            self._rung = asyncio.Event()
+            fd = self._doorbell.listen()
+            asyncio.get_running_loop().add_reader(fd, self._rung.set)
+
+    async def stop(self):
+        """Stop listening. The ring survives, so messages sent meanwhile aren't lost."""
+        if self._ring is not None:
+            asyncio.get_running_loop().remove_reader(self._doorbell._fd)
+            self._doorbell.close()
+            self._ring.close()
+            self._ring = None
+
+    async def close(self):
+        """Stop listening and destroy the ring."""
+        if self._ring is not None:
+            ring, doorbell = self._ring, self._doorbell
+            await self.stop()
+            ring.unlink()
+            doorbell.unlink()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def receive(self, timeout=0):
+        """
+        Return the next message, waiting up to timeout seconds (forever if
+        None) for one to arrive. Return None if nothing arrives in time.
+        """
+        batch = await self.receive_batch(1, timeout)
+        return batch[0] if batch else None
+
+    async def receive_batch(self, max_items=batching.DEFAULT_BATCH_SIZE, timeout=0):
+        await self.start()
+        deadline = batching.deadline_for(timeout)
+        while True:
+            # Clear the doorbell before looking, so a ring that arrives after
+            # we look isn't lost.
+            self._rung.clear()
+            self._doorbell.drain()
+            batch = self._ring.get(max_items)
+            left = batching.remaining(deadline)
+            if batch or (left is not None and left <= 0):
+                return [mwc.MessageWithContext(x) for x in batch]
+            try:
+                await asyncio.wait_for(self._rung.wait(), left)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,245 @@
+"""
+A ring buffer of length-prefixed frames in POSIX shared memory, plus a
+doorbell that tells the reader when frames arrive. Used by shm_sender and
+shm_receiver.
+
+Layout: a header of three unsigned 64-bit counters (capacity, head, tail),
+followed by capacity bytes of data. head and tail only ever grow; a frame
+starts at data offset (counter % capacity) and may wrap around the end.
+There is one reader (the process that created the ring) and any number of
+writers, which serialize on an flock()ed lock file. The reader only moves
+head and writers only move tail, so the reader needs no lock.
+
+The doorbell is a FIFO (named pipe): writers drop a byte into it after each
+write, and the reader watches it with the event loop. Unlike eventfd, a FIFO
+can be opened by unrelated processes knowing only its name.
+
+The lock file and the FIFO live in a directory only the current user can
+use, so other users can't block writers or ring the doorbell. The segment
+outlives the processes that use it; only Ring.unlink() destroys it.
+"""
+import errno
+import fcntl
+import os
+import stat
+import struct
+import tempfile
+from multiprocessing import shared_memory, resource_tracker
+
+from . import framing
+
+DEFAULT_CAPACITY = 1024 * 1024
+_HEADER = struct.Struct('=QQQ')
+_HEAD_OFFSET = 8
+_TAIL_OFFSET = 16
+_COUNTER = struct.Struct('=Q')
+
+
+def _private_dir():
+    """
+    Return (creating it if need be) a directory that only the current user
+    can get into. Raise PermissionError if one by that name exists but isn't
+    ours alone.
+    """
+    path = os.path.join(tempfile.gettempdir(), 'q-shm-%d' % os.getuid())
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+        raise PermissionError('%s must be a directory that only its owner can use.' % path)
+    return path
+
+
+def _path(name, suffix):
+    return os.path.join(_private_dir(), name + suffix)
+
+
+def _shm_name(name):
+    return 'q-' + name
+
+
+def _untrack(shm):
+    # Before python 3.13, the resource tracker unlinks any segment a process
+    # has opened when that process exits. A ring must survive both its writers
+    # and a reader that restarts, so we manage its lifetime ourselves.
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+class RingFull(Exception):
+    pass
+
+
+class Ring:
+    """
+    One end of a shared-memory ring. Use create() in the reading process and
+    attach() in writing processes.
+    """
+
+    def __init__(self, name, shm):
+        self.name = name
+        self._shm = shm
+        self.capacity = _HEADER.unpack_from(shm.buf, 0)[0]
+        self.max_size = min(self.capacity - framing.HEADER.size, framing.MAX_MESSAGE_SIZE)
+        self._lock_fd = None
+
+    @classmethod
+    def create(cls, name, capacity=DEFAULT_CAPACITY):
+        """
+        Create the ring named name, or reopen it if it already exists (e.g.,
+        because a previous reader died), so frames it holds aren't lost. The
+        ring lasts until someone calls unlink(), even after this process exits.
+        """
+        try:
+            shm = shared_memory.SharedMemory(_shm_name(name), create=True, size=_HEADER.size + capacity)
+            _HEADER.pack_into(shm.buf, 0, capacity, 0, 0)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(_shm_name(name))
+        _untrack(shm)
+        return cls(name, shm)
+
+    @classmethod
+    def attach(cls, name):
+        """Open an existing ring for writing. Raise FileNotFoundError if nobody created it."""
+        shm = shared_memory.SharedMemory(_shm_name(name))
+        _untrack(shm)
+        return cls(name, shm)
+
+    def _counters(self):
+        buf = self._shm.buf
+        return _COUNTER.unpack_from(buf, _HEAD_OFFSET)[0], _COUNTER.unpack_from(buf, _TAIL_OFFSET)[0]
+
+    def __len__(self):
+        """How many bytes of frames are waiting to be read."""
+        head, tail = self._counters()
+        return tail - head
+
+    def _copy_in(self, pos, data):
+        buf = self._shm.buf
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        buf[_HEADER.size + start:_HEADER.size + start + first] = data[:first]
+        if first < len(data):
+            buf[_HEADER.size:_HEADER.size + len(data) - first] = data[first:]
+
+    def _copy_out(self, pos, size):
+        buf = self._shm.buf
+        start = pos % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(buf[_HEADER.size + start:_HEADER.size + start + first])
+        if first < size:
+            data += bytes(buf[_HEADER.size:_HEADER.size + size - first])
+        return data
+
+    def _lock(self):
+        if self._lock_fd is None:
+            self._lock_fd = os.open(_path(self.name, '.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def put(self, payloads):
+        """
+        Append as many of payloads as fit, in order. Return how many were
+        written. Raise framing.FrameTooLarge for a payload that could never fit.
+        """
+        frames = [framing.frame(p, self.max_size) for p in payloads]
+        written = 0
+        self._lock()
+        try:
+            head, tail = self._counters()
+            for f in frames:
+                if tail + len(f) - head > self.capacity:
+                    break
+                self._copy_in(tail, f)
+                tail += len(f)
+                written += 1
+            # Publish the new tail only after the frames themselves are in place.
+            _COUNTER.pack_into(self._shm.buf, _TAIL_OFFSET, tail)
+        finally:
+            self._unlock()
+        return written
+
+    def get(self, max_items):
+        """Remove and return up to max_items frames."""
+        head, tail = self._counters()
+        batch = []
+        while head < tail and len(batch) < max_items:
+            size = framing.HEADER.unpack(self._copy_out(head, framing.HEADER.size))[0]
+            batch.append(self._copy_out(head + framing.HEADER.size, size))
+            head += framing.HEADER.size + size
+        if batch:
+            _COUNTER.pack_into(self._shm.buf, _HEAD_OFFSET, head)
+        return batch
+
+    def close(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        if self._shm is not None:
+            shm = self._shm
+            self._shm = None
+            shm.close()
+
+    def unlink(self):
+        """Destroy the ring. Frames not yet read are lost."""
+        shared_memory.SharedMemory(_shm_name(self.name)).unlink()
+        try:
+            os.unlink(_path(self.name, '.lock'))
+        except FileNotFoundError:
+            pass
+
+
+class Doorbell:
+    """The FIFO that writers use to wake the reader of a ring."""
+
+    def __init__(self, name):
+        self.path = _path(name, '.fifo')
+        self._fd = None
+
+    def listen(self):
+        """Create the FIFO (if needed) and return a non-blocking fd the reader can watch."""
+        try:
+            os.mkfifo(self.path, 0o600)
+        except FileExistsError:
+            pass
+        # Open read-write, so the fd never reports EOF when writers come and go.
+        self._fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        return self._fd
+
+    def drain(self):
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def ring(self):
+        """Wake the reader, if one is listening. Never blocks."""
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            os.write(self._fd, b'!')
+        except OSError as e:
+            # ENXIO/ENOENT/EPIPE: nobody is listening. EAGAIN: the reader
+            # already has plenty of wake-ups pending.
+            if e.errno not in (errno.ENXIO, errno.ENOENT, errno.EPIPE, errno.EAGAIN):
+                raise
+            if e.errno != errno.EAGAIN:
+                self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def unlink(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
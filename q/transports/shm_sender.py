@@ -0,0 +1,78 @@
+import asyncio
+import re
+
+from . import batching
+from . import shm_ring
+
+EXAMPLES = 'shm://myagent'
+_PAT = re.compile('^shm://([A-Za-z0-9_.-]{1,200})(?:[?].*)?$')
+DEFAULT_TIMEOUT = 5
+# How often to check for room while the ring is full. The reader doesn't
+# tell writers when it makes room, so we poll, backing off while it's stuck.
+_MIN_FULL_POLL_INTERVAL = 0.001
+_MAX_FULL_POLL_INTERVAL = 0.05
+
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+class Sender:
+    """
+    Put messages in the shared-memory ring (see shm_ring.py) of a receiver
+    in another process on this host, and ring its doorbell. Rings stay
+    attached until close().
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        """
+        :param timeout: Seconds to wait for room when a receiver's ring is full.
+        """
+        self.timeout = timeout
+        self._rings = {}
+
+    def _ring_for(self, uri):
+        name = _PAT.match(uri).group(1)
+        ring = self._rings.get(name)
+        if ring is None:
+            ring = (shm_ring.Ring.attach(name), shm_ring.Doorbell(name))
+            self._rings[name] = ring
+        return ring
+
+    async def send_batch(self, payloads, uri, *args):
+        """Put all payloads in the ring, in order, waiting for room if need be."""
+        ring, doorbell = self._ring_for(uri)
+        payloads = list(payloads)
+        deadline = batching.deadline_for(self.timeout)
+        sent = 0
+        interval = _MIN_FULL_POLL_INTERVAL
+        while True:
+            n = ring.put(payloads[sent:])
+            if n:
+                sent += n
+                doorbell.ring()
+                interval = _MIN_FULL_POLL_INTERVAL
+            else:
+                interval = min(interval * 2, _MAX_FULL_POLL_INTERVAL)
+            if sent == len(payloads):
+                return [None] * sent
+            left = batching.remaining(deadline)
+            if left is not None and left <= 0:
+                raise shm_ring.RingFull('No room in %s for %d messages.' % (uri, len(payloads) - sent))
+            await asyncio.sleep(interval if left is None else min(interval, left))
+
+    async def send(self, payload, uri, *args):
+        await self.send_batch([payload], uri)
+
+    async def close(self):
+        rings = list(self._rings.values())
+        self._rings.clear()
+        for ring, doorbell in rings:
+            ring.close()
+            doorbell.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -1,12 +1,19 @@
+import hashlib
 import re
 import smtplib
 import asyncio
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
 
+from ..message_body import as_bytes
+
 EXAMPLES = 'mailto:alice@example.com?via=user:pass@mail.my.org:587'
+DEFAULT_MAX_IDLE = 2
+DEFAULT_IDLE_TIMEOUT = 240
 _PAT = re.compile(r'mailto:([^@]+@[^?]+)[?](.*?)via=([^:]+):([^@]*)@([^:]+)(?::([1-9][0-9]{0,4}))?(.*)')
 
 
@@ -28,32 +35,140 @@ def split_uri(uri):
     uri = m.group(1)
     return uri, user, password, server, port, headers
 
+def _make_email(payload, email_addr, headers):
+    m = MIMEMultipart()
+    # Put default values in email headers.
+    m['From'] = 'smtp_sender@q'
+    m['Subject'] = 'DIDComm message'
+    # Now override headers with anything from the mailto URL.
+    for header in headers:
+        if len(header) == 2:
+            m[header[0]] = header[1]
+    m['To'] = email_addr
+    m.attach(MIMEText('See attached file.', 'plain'))
+    p = MIMEBase('application', 'octet-stream')
+    p.set_payload(payload)
+    encoders.encode_base64(p)
+    p.add_header('Content-Disposition', "attachment; filename=msg.dp")
+    m.attach(p)
+    return m
+
+
+class _Connection:
+    def __init__(self, server, port, user, password):
+        self.smtp = smtplib.SMTP(server, port)
+        try:
+            self.smtp.starttls()
+            self.smtp.login(user, password)
+        except:
+            self.smtp.close()
+            raise
+        self.last_used = time.monotonic()
+
+    def is_alive(self):
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def quit(self):
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
 class Sender:
+    """
+    Send messages as email attachments. Authenticated SMTP connections are
+    pooled per (server, port, user, password) and reused across sends; an idle
+    connection is checked with NOOP before reuse and replaced if the server
+    has dropped it. Call close() when finished.
+    """
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """
+        :param max_idle: Max number of idle connections to keep per pool key.
+        :param idle_timeout: Seconds after which an idle connection is closed
+          instead of being reused. (Servers drop idle clients eventually.)
+        """
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _checkout(self, key, password):
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                return _Connection(key[0], key[1], key[2], password)
+            if time.monotonic() - conn.last_used < self.idle_timeout and conn.is_alive():
+                return conn
+            conn.quit()
+
+    def _checkin(self, key, conn):
+        conn.last_used = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.quit()
 
     async def send(self, payload, mailto_uri):
+        result = (await self.send_batch([payload], mailto_uri))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def send_batch(self, payloads, mailto_uri):
+        """
+        Send each payload as its own email, over a single pooled SMTP session.
+        Return a list with None for each payload that was sent, and the
+        exception that stopped it for each one that wasn't--so a caller that
+        retries doesn't send the others twice. Raise only if nothing could be
+        sent because we couldn't connect.
+        """
         email_addr, user, password, server, port, headers = split_uri(mailto_uri)
+        # A changed password mustn't reuse a session logged in with the old one.
+        key = (server, port, user, hashlib.sha256(password.encode('utf-8')).hexdigest())
         def do_send():
-            m = MIMEMultipart()
-            # Put default values in email headers.
-            m['From'] = 'smtp_sender@q'
-            m['Subject'] = 'DIDComm message'
-            # Now override headers with anything from the mailto URL.
-            for header in headers:
-                if len(header) == 2:
-                    m[header[0]] = header[1]
-            m['To'] = email_addr
-            m.attach(MIMEText('See attached file.', 'plain'))
-            p = MIMEBase('application', 'octet-stream')
-            p.set_payload(payload)
-            encoders.encode_base64(p)
-            p.add_header('Content-Disposition', "attachment; filename=msg.dp")
-            m.attach(p)
-            s = smtplib.SMTP(server, port)
-            s.starttls()
-            s.login(user, password)
-            s.sendmail(m['From'], email_addr, m.as_string())
-            s.quit()
+            conn = self._checkout(key, password)
+            results = []
+            for payload in payloads:
+                try:
+                    m = _make_email(as_bytes(payload), email_addr, headers)
+                    if conn is None:
+                        conn = _Connection(server, port, user, password)
+                    try:
+                        conn.smtp.sendmail(m['From'], email_addr, m.as_string())
+                    except smtplib.SMTPServerDisconnected:
+                        # The server hung up between checks; reconnect once and retry.
+                        conn.quit()
+                        conn = None
+                        conn = _Connection(server, port, user, password)
+                        conn.smtp.sendmail(m['From'], email_addr, m.as_string())
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+            if conn is not None:
+                self._checkin(key, conn)
+            return results
 
         loop = asyncio.get_event_loop()
         future = loop.run_in_executor(None, do_send)
         return await future
+
+    def _drain(self):
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.quit()
+
+    async def close(self):
+        """Quit all pooled connections."""
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._drain)
@@ -1,45 +1,92 @@
 import asyncio
-import random
+import logging
 import re
-import threading
+import socket
 
-_PAT = re.compile('^tcp://[1-9][0-9]{3,4}$')
-_EXAMPLE = 'tcp://8080'
+from .. import mwc
+from . import framing
+from .ingress_queue import QueuedReceiver
+
+_PAT = re.compile('^tcp://(?:([^:/]+):)?([0-9]{1,5})$')
+EXAMPLES = 'tcp://localhost:8080|tcp://8080'
+DEFAULT_MAX_QUEUE = 1000
 
 HOST = '127.0.0.1'
 
-class _QueueReader:
-    def __init__(self):
-        self.queue = []
-        self.lock = threading.Lock()
-    async def __call__(self, reader, writer):
-        data = []
-        while True:
-            more = await reader.read(1000)  # Max number of bytes to read
-            if not more:
-                break
-            data += more
-            if len(data) < 1000:
-                break
-        if data:
-            with self.lock:
-                self.queue.append(data)
-
-class Receiver:
-    def __init__(self, port=0, *ignored):
-        if port == 0:
-            port = random.randint(1025, 65000)
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+class Receiver(QueuedReceiver):
+    """
+    Listen on a TCP port for length-prefixed messages (see framing.py), and
+    deliver them in the order they arrived. A peer may send any number of
+    messages over one connection. When max_queue messages are waiting for the
+    consumer, we stop reading from sockets, so TCP flow control slows senders
+    down instead of us buffering without limit.
+    """
+
+    def __init__(self, uri=0, max_queue=DEFAULT_MAX_QUEUE, max_size=framing.MAX_MESSAGE_SIZE):
+        """
+        :param uri: Like tcp://localhost:8080, or just a port number. Port 0
+          lets the OS pick a free port; port and endpoint say which once the
+          receiver has started.
+        """
+        host = HOST
+        if isinstance(uri, str):
+            m = _PAT.match(uri)
+            if m.group(1):
+                host = m.group(1)
+            port = int(m.group(2))
+        else:
+            port = uri
+        self.host = host
         self._port = port
+        self.endpoint = 'tcp://%s:%d' % (host, port)
+        self._init_queue(max_queue, max_size)
+
+    def _init_queue(self, max_queue, max_size):
+        self.max_size = max_size
+        self._init_ingress(max_queue)
         self._server = None
-        self._queue_reader = _QueueReader()
 
     @property
     def port(self):
         return self._port
 
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        try:
+            async for payload in framing.read_frames(reader, self.max_size):
+                await self._enqueue(mwc.MessageWithContext(payload))
+        except (framing.FrameTooLarge, asyncio.IncompleteReadError, ConnectionError) as e:
+            logging.warning('Dropping connection from %s: %s' % (peer, e))
+        finally:
+            writer.close()
+
+    async def _start_server(self):
+        host = self.host
+        if self.port == 0:
+            # Each address a name resolves to would get a different free port;
+            # listen on just the first, so the port we report is the only one.
+            infos = await asyncio.get_running_loop().getaddrinfo(host, 0, type=socket.SOCK_STREAM)
+            host = infos[0][4][0]
+        return await asyncio.start_server(self._handle_connection, host, self.port)
+
     async def start(self):
         if self._server is None:
-            self._server = await asyncio.start_server(self._queue_reader, HOST, self.port)
+            self._server = await self._start_server()
+            if self.port == 0:
+                self._port = self._server.sockets[0].getsockname()[1]
+                self.endpoint = 'tcp://%s:%d' % (self.host, self._port)
+
+    async def stop(self):
+        if self._server:
+            server = self._server
+            self._server = None
+            server.close()
+            await server.wait_closed()
 
     def __del__(self):
         if self._server:
@@ -50,16 +97,4 @@ class Receiver:
         return self
 
     async def __aexit__(self, *args):
-        if self._server:
-            self._server.close()
-            self._handle = None
-
-    async def receive(self):
-        qr = self._queue_reader
-        data = None
-        with qr.lock:
-            if qr.queue:
-                data = qr.queue.pop()
-        return data
-
-
+        await self.stop()
@@ -0,0 +1,94 @@
+import asyncio
+import re
+
+from . import framing
+
+EXAMPLES = 'tcp://localhost:8080'
+_PAT = re.compile('^tcp://([^:/]+):([0-9]{1,5})$')
+
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+class Sender:
+    """
+    Send length-prefixed messages (see framing.py) over TCP, keeping one
+    long-lived connection per destination. Call close() when finished, or use
+    the sender as an async context manager.
+    """
+
+    def __init__(self, max_size=framing.MAX_MESSAGE_SIZE):
+        self.max_size = max_size
+        self._conns = {}
+        self._locks = {}
+
+    def _key_for(self, uri):
+        m = _PAT.match(uri)
+        return m.group(1), int(m.group(2))
+
+    async def _connect(self, host, port):
+        return await asyncio.open_connection(host, port)
+
+    async def _writer_for(self, uri):
+        key = self._key_for(uri)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            conn = self._conns.get(key)
+            # Peers never write to us, so EOF on the read side means they hung up.
+            if conn is None or conn[1].is_closing() or conn[0].at_eof():
+                if conn is not None:
+                    conn[1].close()
+                conn = await self._connect(*key)
+                self._conns[key] = conn
+        return key, conn[1]
+
+    def _drop(self, key, writer):
+        conn = self._conns.get(key)
+        if conn is not None and conn[1] is writer:
+            del self._conns[key]
+        writer.close()
+
+    async def _write(self, frames, uri):
+        # All frames go into the transport's buffer in a single call, so
+        # concurrent senders never interleave partial frames. If the
+        # connection has gone stale, reconnect once and try again.
+        for attempt in range(2):
+            key, writer = await self._writer_for(uri)
+            try:
+                writer.writelines(frames)
+                await writer.drain()
+                return
+            except ConnectionError:
+                self._drop(key, writer)
+                if attempt:
+                    raise
+
+    async def send(self, payload, uri, *args):
+        await self._write([framing.frame(payload, self.max_size)], uri)
+
+    async def send_batch(self, payloads, uri, *args):
+        """Write all payloads to uri over one connection, draining once."""
+        if payloads:
+            await self._write([framing.frame(p, self.max_size) for p in payloads], uri)
+        return [None] * len(payloads)
+
+    @property
+    def connection_count(self):
+        return len(self._conns)
+
+    async def close(self):
+        conns = list(self._conns.values())
+        self._conns.clear()
+        for _, writer in conns:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
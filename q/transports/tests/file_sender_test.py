@@ -26,3 +26,14 @@ async def test_file_sender(scratch_space):
             assert not bool(f.read())
             await fs.send('world', fname)
             assert f.read() == 'world'
+
+
+@pytest.mark.asyncio
+async def test_file_sender_batch(scratch_space):
+    fname = os.path.join(scratch_space.name, 'x')
+    with open(fname, 'wb') as f:
+        pass
+    with file_sender.Sender() as fs:
+        await fs.send_batch(['hello', b' ', 'world'], fname)
+    with open(fname, 'rt') as f:
+        assert f.read() == 'hello world'
@@ -1,9 +1,12 @@
+import asyncio
 import os
 import pytest
 import tempfile
 import aiofiles
 
 from ..folder_channel import Channel
+from .. import folder_receiver
+from ...message_body import MessageBody
 
 
 @pytest.fixture()
@@ -63,7 +66,125 @@ async def test_send(scratch_space):
     assert 'hello' == wc.plaintext
 
 
+@pytest.mark.asyncio
+async def test_watched_send_receive(scratch_space):
+    requester = Channel(scratch_space.name)
+    responder = Channel(scratch_space.name, is_destward=False)
+    assert not await responder.receive()
+    waiter = asyncio.ensure_future(responder.wait(5))
+    await requester.send('hello')
+    assert await asyncio.wait_for(waiter, 1)
+    wc = await responder.receive()
+    assert 'hello' == wc.plaintext
+    assert not await responder.receive()
+    responder.close()
+
+
+@pytest.mark.asyncio
+async def test_unwatched_request_response(scratch_space):
+    requester = Channel(scratch_space.name, watch=False)
+    responder = Channel(scratch_space.name, is_destward=False)
+    id = await requester.sender.send('ping', responder.folder)
+    assert not (await requester.peek(id))
+    await responder.send('unrelated')
+    assert not (await requester.peek(id))
+    await responder.send('pong', id)
+    assert await requester.peek(id)
+    wc = await requester.receive(id)
+    assert 'pong' == wc.plaintext
+    wc = await requester.receive()
+    assert 'unrelated' == wc.plaintext
+    requester.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('watch', [True, False])
+async def test_fifo(scratch_space, watch):
+    requester = Channel(scratch_space.name)
+    responder = Channel(scratch_space.name, is_destward=False, watch=watch)
+    # Mix what's there before the receiver starts with what arrives after.
+    for i in range(10):
+        await requester.send(str(i))
+    assert (await responder.receive()).plaintext == '0'
+    for i in range(10, 20):
+        await requester.send(str(i))
+    for i in range(1, 20):
+        assert (await responder.receive()).plaintext == str(i)
+    assert not await responder.receive()
+    responder.close()
+
+
+@pytest.mark.asyncio
+async def test_batch(scratch_space):
+    requester = Channel(scratch_space.name)
+    responder = Channel(scratch_space.name, is_destward=False)
+    assert await responder.receive_batch(10) == []
+    ids = await requester.send_batch(['a', 'b', 'c'])
+    assert len(ids) == 3
+    batch = await responder.receive_batch(2)
+    assert [wc.plaintext for wc in batch] == ['a', 'b']
+    batch = await responder.receive_batch(2, timeout=1)
+    assert [wc.plaintext for wc in batch] == ['c']
+    waiter = asyncio.ensure_future(responder.receive_batch(2, timeout=5))
+    await asyncio.sleep(0.05)
+    await requester.send('d')
+    batch = await asyncio.wait_for(waiter, 1)
+    assert [wc.plaintext for wc in batch] == ['d']
+    responder.close()
+
+
+@pytest.mark.asyncio
+async def test_large_message_streams_through(scratch_space):
+    body = MessageBody(spool_threshold=1024)
+    body.write(b'{"@id": "big", "x": "' + b'y' * (2 * 1024 * 1024) + b'"}')
+    assert body.spooled
+    a = Channel(scratch_space.name, is_destward=True)
+    b = Channel(scratch_space.name, is_destward=False)
+    await a.send(body)
+    wc = await b.receive()
+    assert wc.raw.spooled
+    assert len(wc.raw) == len(body)
+    assert wc.id == 'big'
+
+
+@pytest.mark.asyncio
+async def test_interrupted_read_leaves_file(scratch_space, monkeypatch):
+    a = Channel(scratch_space.name, is_destward=True)
+    b = Channel(scratch_space.name, is_destward=False)
+    await a.send('{"@id": "keep"}')
+
+    async def stuck(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    async def broken(*args, **kwargs):
+        raise OSError('disk hiccup')
+
+    monkeypatch.setattr(folder_receiver.MessageBody, 'from_path', stuck)
+    reading = asyncio.ensure_future(b.receive())
+    await asyncio.sleep(0.01)
+    reading.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await reading
+    monkeypatch.setattr(folder_receiver.MessageBody, 'from_path', broken)
+    assert not await b.receive()
+    monkeypatch.undo()
+    # Nothing was lost; the message is delivered once reading works again.
+    assert (await b.receive()).id == 'keep'
+    assert not await b.receive()
+
+
+@pytest.mark.asyncio
+async def test_too_large_file_is_set_aside(scratch_space, monkeypatch):
+    a = Channel(scratch_space.name, is_destward=True)
+    b = Channel(scratch_space.name, is_destward=False)
+    await a.send('{"@id": "huge", "x": "' + 'y' * 100 + '"}')
+    monkeypatch.setattr(folder_receiver.mwc, 'MAX_MESSAGE_SIZE', 50)
+    assert not await b.receive()
+    assert [f for f in os.listdir(scratch_space.name) if f.endswith(folder_receiver._TOO_LARGE_EXT)]
+    assert not await b.receive()
+
+
 if __name__ == '__main__':
     import asyncio
     asyncio.get_event_loop().set_debug(True)
-    pytest.main([__file__])
\ No newline at end of file
+    pytest.main([__file__])
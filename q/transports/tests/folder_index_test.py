@@ -0,0 +1,74 @@
+import pytest
+
+from .. import folder_index
+from ..folder_index import FolderIndex
+
+
+def test_next_seq_is_monotonic():
+    seqs = [folder_index.next_seq() for i in range(1000)]
+    assert seqs == sorted(set(seqs))
+
+
+def test_fname_round_trip():
+    seq = folder_index.next_seq()
+    fname = folder_index.make_fname('abc.def', seq, '.in')
+    assert fname.startswith('abc.def.')
+    assert fname.endswith('.in')
+    assert folder_index.parse_seq(fname, '.in') == seq
+    assert folder_index.parse_seq('abc.in', '.in') is None
+    assert folder_index.parse_seq('abc.123.in', '.in') is None
+
+
+@pytest.fixture
+def index():
+    x = FolderIndex()
+    for seq, fname in [(3, 'c'), (1, 'b2'), (2, 'a'), (4, 'b1')]:
+        x.add(fname, seq)
+    return x
+
+
+def test_pop_is_fifo(index):
+    assert len(index) == 4
+    assert [index.pop() for i in range(5)] == ['b2', 'a', 'c', 'b1', None]
+    assert not len(index)
+
+
+def test_filter_uses_seq_order(index):
+    assert index.peek('b') == 'b2'
+    assert index.pop('b') == 'b2'
+    assert index.pop('b') == 'b1'
+    assert index.pop('b') is None
+    assert index.pop('x') is None
+    assert [index.pop(), index.pop()] == ['a', 'c']
+
+
+def test_remove(index):
+    index.remove('b2')
+    index.remove('nonexistent')
+    assert 'b2' not in index
+    assert index.pop() == 'a'
+    index.add('b2', 0)
+    assert index.pop() == 'b2'
+
+
+def test_many_removes_compact_heap():
+    x = FolderIndex()
+    for i in range(1000):
+        x.add('%04d' % i, i)
+    for i in range(0, 1000, 2):
+        x.remove('%04d' % i)
+    assert len(x) == 500
+    assert x.pop() == '0001'
+    assert x.pop('09') == '0901'
+
+
+def test_names_list_kept_current_once_filters_are_used(index):
+    index.add('b3', 0)
+    assert index.peek('b') == 'b3'
+    # From now on, adds and removes keep the sorted names in step.
+    index.add('b0', -1)
+    index.remove('b3')
+    assert [index.pop('b') for i in range(4)] == ['b0', 'b2', 'b1', None]
+    index.clear()
+    index.add('b9', 1)
+    assert index.pop('b') == 'b9'
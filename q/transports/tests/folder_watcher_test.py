@@ -0,0 +1,86 @@
+import asyncio
+import os
+import pytest
+import tempfile
+
+from ..folder_watcher import Watcher
+
+
+@pytest.fixture()
+def scratch_space():
+    x = tempfile.TemporaryDirectory()
+    yield x
+    x.cleanup()
+
+
+def _write(folder, fname, txt='hello'):
+    with open(os.path.join(folder, fname), 'wt') as f:
+        f.write(txt)
+
+
+@pytest.fixture(params=[True, False], ids=['inotify', 'polling'])
+def watcher(request, scratch_space):
+    w = Watcher(scratch_space.name, '.in', poll_interval=0.01, use_inotify=request.param)
+    yield w
+    w.close()
+
+
+def test_initial_scan(scratch_space):
+    _write(scratch_space.name, 'a.in')
+    _write(scratch_space.name, 'b.out')
+    _write(scratch_space.name, '.c.in')
+    w = Watcher(scratch_space.name, '.in')
+    assert w.pop() == 'a.in'
+    assert w.pop() is None
+    w.close()
+
+
+def test_sees_new_files(watcher, scratch_space):
+    assert watcher.peek() is None
+    _write(scratch_space.name, 'x.in')
+    _write(scratch_space.name, 'y.in')
+    assert watcher.peek('y') == 'y.in'
+    assert watcher.pop() == 'x.in'
+    assert watcher.pop() == 'y.in'
+    for fname in ['x.in', 'y.in']:
+        os.remove(os.path.join(scratch_space.name, fname))
+    assert watcher.pop() is None
+
+
+def test_ignores_deleted_files(watcher, scratch_space):
+    watcher.start()
+    _write(scratch_space.name, 'x.in')
+    os.remove(os.path.join(scratch_space.name, 'x.in'))
+    assert watcher.pop() is None
+
+
+@pytest.mark.asyncio
+async def test_wait_wakes_on_new_file(watcher, scratch_space):
+    assert not await watcher.wait(0)
+    waiter = asyncio.ensure_future(watcher.wait(5))
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+    _write(scratch_space.name, 'x.in')
+    assert await asyncio.wait_for(waiter, 1)
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out(watcher):
+    assert not await watcher.wait(0.05)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_waiters_all_wake(watcher, scratch_space):
+    waiters = [asyncio.ensure_future(watcher.wait(5)) for i in range(3)]
+    # One waiter giving up mustn't strand the others.
+    assert not await watcher.wait(0.02)
+    await asyncio.sleep(0.02)
+    _write(scratch_space.name, 'x.in')
+    assert await asyncio.wait_for(asyncio.gather(*waiters), 1) == [True] * 3
+
+
+def test_requeue(watcher, scratch_space):
+    _write(scratch_space.name, 'x.in')
+    assert watcher.pop() == 'x.in'
+    watcher.requeue('x.in')
+    assert watcher.pop() == 'x.in'
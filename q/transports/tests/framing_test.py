@@ -0,0 +1,33 @@
+import pytest
+
+from .. import framing
+
+
+def test_round_trip_in_odd_chunks():
+    payloads = [b'', b'a', 'unicode é', b'x' * 100000]
+    stream = b''.join(framing.frame(p) for p in payloads)
+    decoder = framing.Decoder()
+    got = []
+    for i in range(0, len(stream), 7):
+        decoder.feed(stream[i:i + 7])
+        got.extend(decoder)
+    assert got == [b'', b'a', 'unicode é'.encode('utf-8'), b'x' * 100000]
+    assert len(decoder) == 0
+
+
+def test_partial_frame_waits():
+    decoder = framing.Decoder()
+    data = framing.frame(b'hello')
+    decoder.feed(data[:6])
+    assert list(decoder) == []
+    decoder.feed(data[6:])
+    assert list(decoder) == [b'hello']
+
+
+def test_max_size():
+    with pytest.raises(framing.FrameTooLarge):
+        framing.frame(b'x' * 11, max_size=10)
+    decoder = framing.Decoder(max_size=10)
+    decoder.feed(framing.HEADER.pack(11))
+    with pytest.raises(framing.FrameTooLarge):
+        next(decoder)
@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+
+import aiohttp
+import pytest
+
+from ..http_receiver import Receiver
+
+
+@pytest.fixture
+async def receiver():
+    r = Receiver('http://localhost:%d' % random.randint(10000, 65000))
+    yield r
+    await r.stop()
+
+
+async def _post(receiver, data):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(receiver.endpoint, data=data) as resp:
+            await resp.text()
+            return resp
+
+
+@pytest.mark.asyncio
+async def test_receive_from_empty(receiver):
+    assert not await receiver.peek()
+    assert await receiver.receive() is None
+    assert await receiver.receive(0.05) is None
+    assert await receiver.receive_batch(10) == []
+
+
+@pytest.mark.asyncio
+async def test_post_wakes_receiver(receiver):
+    await receiver.peek()
+    waiter = asyncio.ensure_future(receiver.receive(5))
+    await asyncio.sleep(0.05)
+    start = time.monotonic()
+    resp = await _post(receiver, 'hello')
+    assert resp.status == 202
+    wc = await asyncio.wait_for(waiter, 1)
+    assert wc.plaintext == 'hello'
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.asyncio
+async def test_receive_batch_is_fifo(receiver):
+    await receiver.peek()
+    for i in range(5):
+        await _post(receiver, str(i))
+    assert await receiver.peek()
+    batch = await receiver.receive_batch(3)
+    assert [wc.plaintext for wc in batch] == ['0', '1', '2']
+    batch = await receiver.receive_batch(3, timeout=1)
+    assert [wc.plaintext for wc in batch] == ['3', '4']
+
+
+@pytest.mark.asyncio
+async def test_bound_from_uri():
+    r = Receiver('http://localhost:8080?max_queue=7&retry_after=3')
+    assert r.max_queue == 7
+    assert r.retry_after == 3
+    r = Receiver('http://localhost:8080?max_queue=7', max_queue=2)
+    assert r.max_queue == 2
+
+
+@pytest.mark.asyncio
+async def test_backpressure():
+    r = Receiver('http://localhost:%d?max_queue=2&retry_after=5' % random.randint(10000, 65000))
+    try:
+        await r.peek()
+        assert (await _post(r, 'a')).status == 202
+        assert (await _post(r, 'b')).status == 202
+        resp = await _post(r, 'c')
+        assert resp.status == 503
+        assert resp.headers['Retry-After'] == '5'
+        assert r.depth == 2
+        assert r.stats.accepted == 2
+        assert r.stats.rejected == 1
+        batch = await r.receive_batch(10)
+        assert [wc.plaintext for wc in batch] == ['a', 'b']
+        assert r.depth == 0
+        assert r.stats.delivered == 2
+        assert r.stats.max_wait >= r.stats.mean_wait > 0
+        assert (await _post(r, 'c')).status == 202
+        async with aiohttp.ClientSession() as session:
+            async with session.get(r.endpoint.split('?')[0] + '/stats') as resp:
+                report = await resp.json()
+        assert report['depth'] == 1
+        assert report['rejected'] == 1
+        assert report['max_queue'] == 2
+    finally:
+        await r.stop()
+
+
+@pytest.mark.asyncio
+async def test_oversized_post_rejected(receiver, monkeypatch):
+    from ... import mwc
+    monkeypatch.setattr(mwc, 'MAX_MESSAGE_SIZE', 1000)
+    await receiver.peek()
+    assert (await _post(receiver, 'x' * 1001)).status == 413
+
+    async def chunks():
+        # No Content-Length, so the limit has to be enforced while reading.
+        for i in range(5):
+            yield b'x' * 300
+    assert (await _post(receiver, chunks())).status == 413
+    assert receiver.depth == 0
+    assert (await _post(receiver, 'x' * 1000)).status == 202
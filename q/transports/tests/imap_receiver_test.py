@@ -1,7 +1,9 @@
 import asyncio
 import os
 import pytest
+import socket
 import tempfile
+import time
 from unittest.mock import patch, call
 
 from .. import imap_receiver
@@ -36,7 +38,9 @@ def scratch_space():
 
 @pytest.fixture
 def testqueue(scratch_space):
-    return imap_receiver.MailQueue(scratch_space.name)
+    q = imap_receiver.MailQueue(scratch_space.name)
+    yield q
+    q.close()
 
 
 def test_queue_pop_empty(testqueue):
@@ -49,6 +53,130 @@ def test_queue_push1(testqueue):
     assert not bool(testqueue.pop())
 
 
+def test_queue_is_fifo(testqueue):
+    for i in range(5):
+        testqueue.push(b'msg%d' % i)
+    assert len(testqueue) == 5
+    assert [testqueue.pop() for i in range(5)] == [b'msg%d' % i for i in range(5)]
+    assert testqueue.pop() is None
+
+
+def test_queue_survives_reopen(scratch_space, testqueue):
+    testqueue.push(b'first')
+    testqueue.push(b'second')
+    testqueue.close()
+    q = imap_receiver.MailQueue(scratch_space.name)
+    assert q.pop() == b'first'
+    assert q.pop() == b'second'
+    q.close()
+
+
+def test_unacked_lease_is_redelivered(scratch_space, testqueue):
+    testqueue.push(b'hi')
+    msg_id, data = testqueue.lease()
+    assert data == b'hi'
+    assert testqueue.lease() is None
+    # Simulate a crash before the message was handled.
+    testqueue.close()
+    q = imap_receiver.MailQueue(scratch_space.name)
+    msg_id, data = q.lease()
+    assert data == b'hi'
+    q.ack(msg_id)
+    q.close()
+    q = imap_receiver.MailQueue(scratch_space.name)
+    assert q.lease() is None
+    q.close()
+
+
+def test_expired_lease_is_redelivered(testqueue):
+    testqueue.push(b'a')
+    testqueue.push(b'b')
+    msg_id, _ = testqueue.lease(timeout=0)
+    assert testqueue.lease()[1] == b'a'
+    assert testqueue.lease()[1] == b'b'
+    assert testqueue.lease() is None
+
+
+def test_queue_release(testqueue):
+    testqueue.push(b'a')
+    testqueue.push(b'b')
+    msg_id, _ = testqueue.lease()
+    testqueue.release(msg_id)
+    assert testqueue.pop() == b'a'
+
+
+def test_queue_imports_legacy_files(scratch_space):
+    for name in ['2019-01-01T00-00-00.000001', '2019-01-01T00-00-00.000002']:
+        with open(os.path.join(scratch_space.name, name + '.email'), 'wb') as f:
+            f.write(name.encode('ascii'))
+    q = imap_receiver.MailQueue(scratch_space.name)
+    assert not [x for x in os.listdir(scratch_space.name) if x.endswith('.email')]
+    assert q.pop() == b'2019-01-01T00-00-00.000001'
+    assert q.pop() == b'2019-01-01T00-00-00.000002'
+    q.close()
+
+
+@pytest.mark.asyncio
+async def test_receive_from_mail_queue(scratch_space):
+    rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, imap_receiver.MailQueue(scratch_space.name))
+    rec.queue.push(_get_sample_email('dp_body'))
+    assert bool(await rec.receive())
+    assert len(rec.queue) == 0
+    rec.close()
+
+
+@pytest.mark.asyncio
+async def test_received_msg_stays_queued_until_acked(scratch_space):
+    rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, imap_receiver.MailQueue(scratch_space.name))
+    rec.queue.push(_get_sample_email('dp_body'))
+    rec.queue.push(_get_sample_email('dp_attached'))
+    assert bool(await rec.receive())
+    assert len(rec.leases) == 1
+    # Simulate a crash before the message was handled.
+    rec.queue.close()
+    rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, imap_receiver.MailQueue(scratch_space.name))
+    assert bool(await rec.receive())
+    rec.ack()
+    assert not rec.leases
+    # Receiving again acks the previous message.
+    assert bool(await rec.receive())
+    rec.queue.close()
+    rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, imap_receiver.MailQueue(scratch_space.name))
+    assert len(rec.queue) == 1
+    rec.close()
+
+
+@pytest.mark.asyncio
+async def test_taken_leases_wait_for_explicit_ack(scratch_space):
+    rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, imap_receiver.MailQueue(scratch_space.name))
+    rec.queue.push(_get_sample_email('dp_body'))
+    rec.queue.push(_get_sample_email('dp_attached'))
+    assert len(await rec.receive_batch(1)) == 1
+    first = rec.take_leases()
+    assert len(await rec.receive_batch(1)) == 1
+    second = rec.take_leases()
+    # Receiving again didn't ack either of them.
+    assert await rec.receive_batch(1) == []
+    rec.ack(second)
+    rec.queue.close()
+    rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, imap_receiver.MailQueue(scratch_space.name))
+    assert len(rec.queue) == 1
+    rec.close()
+
+
+@pytest.mark.asyncio
+async def test_unacked_msg_is_redelivered_after_lease_timeout(scratch_space):
+    rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, imap_receiver.MailQueue(scratch_space.name),
+                                 lease_timeout=0)
+    rec.queue.push(_get_sample_email('dp_body'))
+    batch = await rec.receive_batch(1)
+    # Another receiver on the same queue gets the message the first one never acked.
+    other = imap_receiver.Receiver(imap_receiver.EXAMPLE, rec.queue)
+    again = await other.receive_batch(1)
+    assert again and again[0].plaintext == batch[0].plaintext
+    rec.close()
+
+
 def _get_sample_email(which):
     fname = os.path.join(_DATA_FILES_FOLDER, which + '.email')
     with open(fname, 'rb') as f:
@@ -105,6 +233,26 @@ def test_bytes_to_mwc_json_attached(urec):
     assert bool(wc.plaintext)
     assert wc.tc.trust_for(CONFIDENTIALITY | INTEGRITY) == False
 
+def test_bytes_to_mwc_only_parses_the_part_it_wants(urec):
+    big = b'x' * 1000000
+    raw = (b'Content-Type: multipart/mixed; boundary=b\n\n'
+           b'--b\nContent-Type: application/octet-stream\n'
+           b'Content-Disposition: attachment; filename="big.bin"\n\n' + big + b'\n'
+           b'--b\nContent-Type: application/octet-stream\n'
+           b'Content-Disposition: attachment; filename="tiny.dw"\n\n'
+           b'{"protected": "' + b'a' * 200 + b'", "ciphertext": "def", "iv": "ghi", "tag": "jkl"}\n'
+           b'--b--\n')
+    parsed = []
+    real_parse = imap_receiver.mime_scan.email.message_from_bytes
+    def spy(data):
+        parsed.append(len(data))
+        return real_parse(data)
+    with patch.object(imap_receiver.mime_scan.email, 'message_from_bytes', spy):
+        wc = urec.bytes_to_mwc(raw)
+    assert bool(wc.ciphertext)
+    assert parsed and max(parsed) < 1000
+
+
 @pytest.fixture
 def inmemrec():
     return imap_receiver.Receiver(imap_receiver.EXAMPLE, InMemoryQueue())
@@ -115,30 +263,188 @@ async def test_receive_from_local_queue(inmemrec):
     assert bool(await inmemrec.receive())
 
 
+def _mock_imap(patched, *uid_results):
+    # patched.return_value = the mock that's returned from the constructor
+    # of the class.
+    mock = patched.return_value
+    mock.reset_mock()
+    # Make the login method of the mock instance return this tuple.
+    mock.login.return_value = ('OK', None)
+    # Have the .select() method return OK as bytes.
+    mock.select.return_value = ('OK'.encode('utf-8'), None)
+    mock.response.return_value = ('UIDVALIDITY', [b'42'])
+    mock.uid.side_effect = list(uid_results)
+    return mock
+
+
+def _fetched(uid, which='dw_attached'):
+    raw = _get_sample_email(which)
+    return [(b'%s (UID %s RFC822 {%d}' % (uid, uid, len(raw)), raw), b')']
+
+
+def _new_mail(*uids):
+    # What uid('SEARCH'), uid('FETCH') and uid('STORE') return for new messages.
+    fetched = []
+    for uid in uids:
+        fetched += _fetched(uid)
+    return [('OK', [b' '.join(uids)]), ('OK', fetched), ('OK', None)]
+
+
 @pytest.mark.asyncio
 async def test_receive_over_mocked_imap(inmemrec):
     # Mock the class that imap_receiver creates when it builds an imap session.
     with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
-        # patched.return_value = the mock that's returned from the constructor
-        # of the class.
-        mock = patched.return_value
-        # Make the login method of the mock instance return this tuple.
-        mock.login.return_value = ('OK', None)
-        # Have the .select() method return OK as bytes.
-        mock.select.return_value = ('OK'.encode('utf-8'), None)
-        # Have the .uid() method return data for uid('SEARCH') on first call,
-        # data for uid('FETCH') on second call, and OK for uid('DELETE') on
-        # third call.
-        mock.uid.side_effect = [('OK', [b"id1"]),
-                                    ('OK', [(b"id1", _get_sample_email('dw_attached'))]),
-                                    ('OK', None)]
+        mock = _mock_imap(patched, *_new_mail(b"1"))
         assert bool(await inmemrec.receive())
         mock.login.assert_called_once()
         mock.select.assert_called_once()
         mock.uid.assert_called()
+        assert mock.uid.call_args_list[0] == call('SEARCH', None, 'UID', '1:*')
+        # The session stays open until the receiver is closed.
+        mock.close.assert_not_called()
+        inmemrec.close()
         mock.close.assert_called_once()
+        mock.logout.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_session_is_reused(inmemrec):
+    with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
+        mock = _mock_imap(patched, *(_new_mail(b"1") + _new_mail(b"2")))
+        assert bool(await inmemrec.receive())
+        assert bool(await inmemrec.receive())
+        patched.assert_called_once()
+        mock.login.assert_called_once()
+        # The second search only asks for messages newer than the first.
+        assert mock.uid.call_args_list[3] == call('SEARCH', None, 'UID', '2:*')
+        inmemrec.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_and_trash_in_bulk(inmemrec):
+    with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
+        mock = _mock_imap(patched, *_new_mail(b"3", b"4", b"5", b"9"))
+        batch = await inmemrec.receive_batch(10)
+        assert len(batch) == 4
+        assert mock.uid.call_args_list == [
+            call('SEARCH', None, 'UID', '1:*'),
+            call('FETCH', '3:5,9', '(RFC822)'),
+            call('STORE', '3:5,9', '+X-GM-LABELS', '\\Trash')]
+        inmemrec.close()
+
+
+def test_uid_set():
+    assert imap_receiver._uid_set(['7', '1', '2', '3', '10', '11']) == '1:3,7,10:11'
+    assert imap_receiver._uid_set(['5']) == '5'
 
 
+@pytest.mark.asyncio
+async def test_high_water_mark_survives_restart(scratch_space):
+    state_path = os.path.join(scratch_space.name, 'state.json')
+    with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
+        rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, InMemoryQueue(), state_path)
+        _mock_imap(patched, *_new_mail(b"7"))
+        assert bool(await rec.receive())
+        rec.close()
+
+        rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, InMemoryQueue(), state_path)
+        # The server always reports the highest UID, even if it's old.
+        mock = _mock_imap(patched, ('OK', [b"7"]))
+        assert not bool(await rec.receive())
+        assert mock.uid.call_args_list == [call('SEARCH', None, 'UID', '8:*')]
+        rec.close()
+
+
+@pytest.mark.asyncio
+async def test_new_uidvalidity_resets_high_water_mark(scratch_space):
+    state_path = os.path.join(scratch_space.name, 'state.json')
+    hwm = imap_receiver.HighWaterMark(state_path)
+    hwm.uidvalidity = 41
+    hwm.uid = 100
+    hwm.save()
+    with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
+        rec = imap_receiver.Receiver(imap_receiver.EXAMPLE, InMemoryQueue(), state_path)
+        mock = _mock_imap(patched, *_new_mail(b"3"))
+        assert bool(await rec.receive())
+        assert mock.uid.call_args_list[0] == call('SEARCH', None, 'UID', '1:*')
+        rec.close()
+    assert imap_receiver.HighWaterMark(state_path).uid == 3
+
+
+@pytest.mark.asyncio
+async def test_backs_off_after_failure(inmemrec):
+    with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
+        mock = _mock_imap(patched)
+        mock.login.side_effect = Exception('server is down')
+        assert not bool(await inmemrec.receive())
+        # We shouldn't hammer the server while backing off.
+        assert not bool(await inmemrec.receive())
+        patched.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_waits_out_timeout_while_backing_off(inmemrec):
+    with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
+        mock = _mock_imap(patched)
+        mock.login.side_effect = Exception('server is down')
+        for i in range(2):
+            # Once for the failure, once while backing off.
+            start = time.monotonic()
+            assert await inmemrec.receive_batch(10, timeout=0.2) == []
+            assert time.monotonic() - start >= 0.2
+        patched.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_no_timeout_waits_for_mail(inmemrec, monkeypatch):
+    monkeypatch.setattr(imap_receiver, '_POLL_INTERVAL', 0.01)
+    with patch(__name__ + '.imap_receiver.imaplib.IMAP4_SSL', autospec=True) as patched:
+        # Nothing the first two times we look; then a message.
+        mock = _mock_imap(patched, ('OK', [b'']), ('OK', [b'']), *_new_mail(b"1"))
+        batch = await asyncio.wait_for(inmemrec.receive_batch(10, None), 5)
+        assert len(batch) == 1
+        inmemrec.close()
+
+
+class _SocketImap:
+    """Just enough of imaplib.IMAP4 for _idle(), over a real socket."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.file = sock.makefile('rb')
+    def socket(self):
+        return self.sock
+    def send(self, data):
+        self.sock.sendall(data)
+    def readline(self):
+        return self.file.readline()
+
+
+def test_idle_sees_lines_already_buffered():
+    ours, server = socket.socketpair()
+    try:
+        # The change arrives in the same segment as the continuation.
+        server.sendall(b'+ idling\r\n* 3 EXISTS\r\nQIDLE OK IDLE terminated\r\n')
+        start = time.monotonic()
+        assert imap_receiver._idle(_SocketImap(ours), 5)
+        assert time.monotonic() - start < 1
+        assert server.recv(100) == b'QIDLE IDLE\r\nDONE\r\n'
+    finally:
+        ours.close()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_receive_batch_from_local_queue(inmemrec):
+    inmemrec.queue.push(_get_sample_email('dp_body'))
+    inmemrec.queue.push(_get_sample_email('dp_attached'))
+    inmemrec.queue.push(_get_sample_email('dw_attached'))
+    batch = await inmemrec.receive_batch(2)
+    assert len(batch) == 2
+    assert bool(batch[0].plaintext)
+    batch = await inmemrec.receive_batch(2)
+    assert len(batch) == 1
+    assert bool(batch[0].ciphertext)
+
 if __name__ == '__main__':
     asyncio.get_event_loop().set_debug(True)
     pytest.main(['-k', 'test_bytes_to_mwc_dp_body'])
\ No newline at end of file
@@ -0,0 +1,53 @@
+import email
+import os
+import pytest
+
+from .. import mime_scan
+
+_DATA_FILES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../../messages/email')
+_SAMPLES = ['dp_attached', 'dp_body', 'dw_attached', 'text_body']
+
+
+def _get_sample_email(which):
+    with open(os.path.join(_DATA_FILES_FOLDER, which + '.email'), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('which', _SAMPLES)
+def test_leaf_parts_agree_with_walk(which):
+    raw = _get_sample_email(which)
+    expected = [p for p in email.message_from_bytes(raw).walk() if not p.is_multipart()]
+    parts = list(mime_scan.leaf_parts(raw))
+    assert len(parts) == len(expected)
+    for part, exp in zip(parts, expected):
+        assert part.headers.get_content_type() == exp.get_content_type()
+        assert part.headers.get_filename() == exp.get_filename()
+        assert part.message().get_payload(decode=True) == exp.get_payload(decode=True)
+
+
+def test_crlf_and_nested_multipart():
+    raw = (b'Content-Type: multipart/mixed; boundary="outer"\r\n\r\n'
+           b'preamble\r\n'
+           b'--outer\r\n'
+           b'Content-Type: multipart/alternative; boundary=inner\r\n\r\n'
+           b'--inner\r\n'
+           b'Content-Type: text/plain\r\n\r\n'
+           b'hello\r\n'
+           b'--inner--\r\n'
+           b'--outer\r\n'
+           b'Content-Type: application/octet-stream\r\n'
+           b'Content-Disposition: attachment; filename="x.dw"\r\n\r\n'
+           b'{"a": 1}\r\n'
+           b'--outer--\r\n')
+    parts = list(mime_scan.leaf_parts(raw))
+    assert [p.headers.get_content_type() for p in parts] == ['text/plain', 'application/octet-stream']
+    assert parts[0].message().get_payload() == 'hello'
+    assert parts[1].headers.get_filename() == 'x.dw'
+    assert parts[1].message().get_payload(decode=True) == b'{"a": 1}'
+
+
+def test_unparseable():
+    with pytest.raises(mime_scan.Unparseable):
+        list(mime_scan.leaf_parts(b'Content-Type: multipart/mixed; boundary=x\n\nno delimiters here\n'))
+    with pytest.raises(mime_scan.Unparseable):
+        list(mime_scan.leaf_parts(b'Content-Type: multipart/mixed\n\n--x\n\nhi\n--x--\n'))
@@ -1,5 +1,8 @@
+import asyncio
+import gc
 import pytest
 
+from .. import ram_transport
 from ..ram_transport import RamTransport
 
 
@@ -41,3 +44,46 @@ async def test_ram_send_receive_order(t):
     assert await t.receive() == '1'
     assert await t.receive() == '2'
     assert await t.receive() == '3'
+
+
+@pytest.mark.asyncio
+async def test_ram_batch(t):
+    assert await t.receive_batch(10) == []
+    assert await t.send_batch(['1', '2', '3'], 'x') == [True, True, True]
+    assert await t.receive_batch(2) == ['1', '2']
+    assert await t.receive_batch(2, timeout=1) == ['3']
+    assert await t.receive_batch(2, timeout=0.05) == []
+
+
+@pytest.mark.asyncio
+async def test_ram_receive_waits_for_send(t):
+    async def send_later():
+        await asyncio.sleep(0.05)
+        await t.send('late', 'x')
+    task = asyncio.ensure_future(send_later())
+    assert await t.receive(timeout=2) == 'late'
+    await task
+    assert await t.receive(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_ram_bounded_capacity():
+    t = RamTransport('bounded', capacity=2)
+    assert await t.send_batch(['1', '2'], 'bounded') == [True, True]
+    assert not await t.queue.send('3', timeout=0.01)
+    sending = asyncio.ensure_future(t.send('3', 'bounded'))
+    await asyncio.sleep(0.01)
+    assert not sending.done()
+    assert await t.receive() == '1'
+    assert await asyncio.wait_for(sending, 1)
+    assert await t.receive_batch(10) == ['2', '3']
+
+
+def test_ram_registry():
+    a = RamTransport('shared')
+    b = RamTransport('shared')
+    assert a.queue is b.queue
+    assert ram_transport._all['shared'] is a.queue
+    del a, b
+    gc.collect()
+    assert 'shared' not in ram_transport._all
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import subprocess
+import sys
+import uuid
+import pytest
+
+from .. import shm_ring
+from .. import shm_receiver
+from .. import shm_sender
+
+_PACKAGE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../..')
+
+
+@pytest.fixture
+async def receiver():
+    r = shm_receiver.Receiver('shm://test-%s?capacity=4096' % uuid.uuid4().hex[:12])
+    await r.start()
+    yield r
+    await r.close()
+
+
+@pytest.fixture
+async def sender():
+    s = shm_sender.Sender(timeout=1)
+    yield s
+    await s.close()
+
+
+def test_match():
+    assert shm_sender.match('shm://myagent')
+    assert shm_receiver.match('shm://myagent?capacity=100')
+    assert not shm_receiver.match('shm://my/agent')
+
+
+@pytest.mark.asyncio
+async def test_send_and_receive_in_order(receiver, sender):
+    await sender.send('msg0', receiver.endpoint)
+    await sender.send_batch([b'b%d' % i for i in range(20)], receiver.endpoint)
+    batch = await receiver.receive_batch(100)
+    assert [wc.plaintext for wc in batch] == ['msg0'] + ['b%d' % i for i in range(20)]
+    assert await receiver.receive() is None
+
+
+@pytest.mark.asyncio
+async def test_wraps_around(receiver, sender):
+    # Each frame is 1004 bytes, so writes wrap around the 4096-byte ring.
+    payload = b'x' * 1000
+    for i in range(10):
+        await sender.send_batch([payload, payload, payload], receiver.endpoint)
+        batch = await receiver.receive_batch(10)
+        assert [wc.plaintext for wc in batch] == [payload.decode('ascii')] * 3
+
+
+@pytest.mark.asyncio
+async def test_full_ring_waits_for_room(receiver, sender):
+    payload = b'y' * 2000
+    sending = asyncio.ensure_future(sender.send_batch([payload] * 4, receiver.endpoint))
+    received = []
+    while len(received) < 4:
+        received += await receiver.receive_batch(10, timeout=1)
+    await asyncio.wait_for(sending, 1)
+    assert len(received) == 4
+
+
+@pytest.mark.asyncio
+async def test_too_big(receiver, sender):
+    with pytest.raises(shm_ring.framing.FrameTooLarge):
+        await sender.send(b'z' * 5000, receiver.endpoint)
+
+
+@pytest.mark.asyncio
+async def test_wakes_for_other_process(receiver):
+    code = ('import asyncio\n'
+            'from q.transports import shm_sender\n'
+            'async def main():\n'
+            '    async with shm_sender.Sender() as s:\n'
+            '        await s.send("from afar", %r)\n'
+            'asyncio.run(main())\n' % receiver.endpoint)
+    proc = await asyncio.create_subprocess_exec(sys.executable, '-c', code, cwd=_PACKAGE_ROOT)
+    wc = await receiver.receive(timeout=10)
+    assert await proc.wait() == 0
+    assert wc.plaintext == 'from afar'
+
+
+def test_ring_outlives_its_creator():
+    name = 'test-%s' % uuid.uuid4().hex[:12]
+    code = ('from q.transports import shm_ring\n'
+            'ring = shm_ring.Ring.create(%r, 4096)\n'
+            'ring.put([b"left behind"])\n'
+            'ring.close()\n' % name)
+    subprocess.check_call([sys.executable, '-c', code], cwd=_PACKAGE_ROOT)
+    # A reader that restarts finds what was waiting for it.
+    ring = shm_ring.Ring.create(name)
+    try:
+        assert ring.get(10) == [b'left behind']
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_lock_and_fifo_are_private(receiver):
+    path = shm_ring.Doorbell(receiver.name).path
+    folder = os.path.dirname(path)
+    assert os.stat(folder).st_mode & 0o777 == 0o700
+    assert os.stat(folder).st_uid == os.getuid()
+    assert os.path.exists(path)
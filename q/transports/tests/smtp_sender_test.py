@@ -17,9 +17,92 @@ async def test_smtp_send():
         mock.starttls.assert_called_once()
         mock.login.assert_called_once()
         mock.sendmail.assert_called_once()
+        # The connection stays open for reuse until the sender is closed.
+        mock.quit.assert_not_called()
+        await sender.close()
         mock.quit.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_smtp_send_batch():
+    with patch(__name__ + '.smtp_sender.smtplib.SMTP', autospec=True) as patched:
+        mock = patched.return_value
+        sender = smtp_sender.Sender()
+        await sender.send_batch([b'hello', b'world'], smtp_sender.EXAMPLES)
+        patched.assert_called_once()
+        mock.login.assert_called_once()
+        assert mock.sendmail.call_count == 2
+        await sender.close()
+        mock.quit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_smtp_connection_reuse():
+    with patch(__name__ + '.smtp_sender.smtplib.SMTP', autospec=True) as patched:
+        mock = patched.return_value
+        mock.noop.return_value = (250, b'OK')
+        sender = smtp_sender.Sender()
+        for i in range(3):
+            await sender.send(b'hello', smtp_sender.EXAMPLES)
+        patched.assert_called_once()
+        mock.login.assert_called_once()
+        assert mock.noop.call_count == 2
+        assert mock.sendmail.call_count == 3
+        # A different user gets a different connection.
+        await sender.send(b'hello', smtp_sender.EXAMPLES.replace('user:', 'other:'))
+        assert patched.call_count == 2
+        await sender.close()
+        assert mock.quit.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_smtp_reconnects_when_dropped():
+    with patch(__name__ + '.smtp_sender.smtplib.SMTP', autospec=True) as patched:
+        mock = patched.return_value
+        sender = smtp_sender.Sender()
+        await sender.send(b'hello', smtp_sender.EXAMPLES)
+        # Server timed us out; NOOP fails, so we should reconnect.
+        mock.noop.side_effect = smtp_sender.smtplib.SMTPServerDisconnected()
+        await sender.send(b'hello', smtp_sender.EXAMPLES)
+        assert patched.call_count == 2
+        assert mock.login.call_count == 2
+        # Server hangs up between the NOOP and the send.
+        mock.noop.side_effect = None
+        mock.noop.return_value = (250, b'OK')
+        mock.sendmail.side_effect = [smtp_sender.smtplib.SMTPServerDisconnected(), {}]
+        await sender.send(b'hello', smtp_sender.EXAMPLES)
+        assert patched.call_count == 3
+        await sender.close()
+
+@pytest.mark.asyncio
+async def test_smtp_new_password_gets_new_connection():
+    with patch(__name__ + '.smtp_sender.smtplib.SMTP', autospec=True) as patched:
+        mock = patched.return_value
+        mock.noop.return_value = (250, b'OK')
+        sender = smtp_sender.Sender()
+        await sender.send(b'hello', smtp_sender.EXAMPLES)
+        await sender.send(b'hello', smtp_sender.EXAMPLES.replace(':pass@', ':newpass@'))
+        assert patched.call_count == 2
+        assert mock.login.call_args_list[-1] == call('user', 'newpass')
+        await sender.close()
+
+
+@pytest.mark.asyncio
+async def test_smtp_batch_reports_each_payload():
+    with patch(__name__ + '.smtp_sender.smtplib.SMTP', autospec=True) as patched:
+        mock = patched.return_value
+        refused = smtp_sender.smtplib.SMTPRecipientsRefused({})
+        mock.sendmail.side_effect = [{}, refused, {}]
+        sender = smtp_sender.Sender()
+        results = await sender.send_batch([b'a', b'b', b'c'], smtp_sender.EXAMPLES)
+        # What was sent is reported as sent, so it needn't be sent again.
+        assert results == [None, refused, None]
+        mock.sendmail.side_effect = [refused]
+        with pytest.raises(smtp_sender.smtplib.SMTPRecipientsRefused):
+            await sender.send(b'd', smtp_sender.EXAMPLES)
+        await sender.close()
+
+
 if __name__ == '__main__':
     asyncio.get_event_loop().set_debug(True)
     pytest.main(['-k', 'smtp'])
\ No newline at end of file
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+from .. import framing
+from .. import tcp_socket_receiver
+from .. import tcp_socket_sender
+
+
+@pytest.fixture
+async def receiver():
+    r = tcp_socket_receiver.Receiver('tcp://localhost:0')
+    await r.start()
+    yield r
+    await r.stop()
+
+
+@pytest.fixture
+async def sender():
+    s = tcp_socket_sender.Sender()
+    yield s
+    await s.close()
+
+
+@pytest.mark.asyncio
+async def test_port_0_gets_free_port(receiver):
+    assert receiver.port != 0
+    assert receiver.endpoint == 'tcp://localhost:%d' % receiver.port
+
+
+def test_match():
+    assert tcp_socket_sender.match('tcp://localhost:8080')
+    assert not tcp_socket_sender.match('tcp://8080')
+    assert tcp_socket_receiver.match('tcp://8080')
+    assert tcp_socket_receiver.match('tcp://localhost:8080')
+
+
+@pytest.mark.asyncio
+async def test_send_and_receive_in_order(receiver, sender):
+    for i in range(3):
+        await sender.send('msg%d' % i, receiver.endpoint)
+    await sender.send_batch([b'big' * 100000] + [b'b%d' % i for i in range(100)], receiver.endpoint)
+    batch = []
+    while len(batch) < 104:
+        more = await receiver.receive_batch(200, timeout=2)
+        assert more
+        batch += more
+    assert [wc.plaintext for wc in batch[:3]] == ['msg0', 'msg1', 'msg2']
+    assert len(batch[3].plaintext) == 300000
+    assert [wc.plaintext for wc in batch[4:]] == ['b%d' % i for i in range(100)]
+    # Everything went over a single connection.
+    assert sender.connection_count == 1
+    assert receiver.stats.accepted == 104
+
+
+@pytest.mark.asyncio
+async def test_receive_times_out(receiver):
+    assert await receiver.receive(timeout=0.05) is None
+    assert await receiver.receive_batch(timeout=0) == []
+
+
+@pytest.mark.asyncio
+async def test_oversized_frame_is_dropped(receiver):
+    receiver.max_size = 10
+    reader, writer = await asyncio.open_connection(receiver.host, receiver.port)
+    writer.write(framing.HEADER.pack(11) + b'x' * 11)
+    await writer.drain()
+    assert await reader.read() == b''
+    writer.close()
+    assert await receiver.receive(timeout=0.05) is None
+
+
+@pytest.mark.asyncio
+async def test_sender_reconnects(receiver, sender):
+    await sender.send('one', receiver.endpoint)
+    assert (await receiver.receive(timeout=2)).plaintext == 'one'
+    # Restart the receiver, which drops the sender's connection.
+    await receiver.stop()
+    await receiver.start()
+    await asyncio.sleep(0.05)
+    await sender.send('two', receiver.endpoint)
+    assert (await receiver.receive(timeout=2)).plaintext == 'two'
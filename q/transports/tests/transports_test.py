@@ -1,4 +1,7 @@
+import importlib
 import os
+import subprocess
+import sys
 import pytest
 import tempfile
 
@@ -37,6 +40,43 @@ def test_sender_examples_match_patterns(file_and_folder):
         check_examples(item, file_and_folder)
 
 
+def test_every_plugin_is_declared():
+    declared = {x.name for x in transports.SENDERS + transports.RECEIVERS}
+    folder = os.path.dirname(os.path.abspath(transports.__file__))
+    for fname in os.listdir(folder):
+        name, ext = os.path.splitext(fname)
+        if ext == '.py' and (name.endswith('_sender') or name.endswith('_receiver')):
+            module = importlib.import_module('.' + name, transports.__name__)
+            if hasattr(module, 'match') and hasattr(module, 'EXAMPLES'):
+                assert name in declared
+
+
+def test_declarations_agree_with_modules(file_and_folder):
+    for item in transports.SENDERS + transports.RECEIVERS:
+        assert item.examples == item.module.EXAMPLES
+        for example in item.examples.replace('~/myfile.dat', file_and_folder[0]).replace(
+                '~/myfolder', file_and_folder[1]).split('|'):
+            assert item.module.match(example)
+
+
+def test_load_imports_only_what_it_needs(file_and_folder):
+    code = ('import sys\n'
+            'from q import transports\n'
+            'transports.load(%r, transports.SENDERS)\n'
+            'print(" ".join(sorted(m for m in sys.modules if m.startswith("q.transports."))))\n'
+            % file_and_folder[1])
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../..')
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=root).decode('utf-8').split()
+    assert 'q.transports.folder_sender' in out
+    for heavy in ['http_sender', 'smtp_sender', 'ws_sender', 'http_receiver', 'imap_receiver']:
+        assert 'q.transports.' + heavy not in out
+
+
+def test_load_unknown():
+    with pytest.raises(ValueError):
+        transports.load('bogus://x', transports.SENDERS)
+
+
 if __name__ == '__main__':
     import pytest
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import socket
+import tempfile
+import pytest
+
+from ... import transports
+from .. import unix_receiver
+from .. import unix_sender
+
+
+@pytest.fixture
+def sock_path():
+    x = tempfile.TemporaryDirectory()
+    yield os.path.join(x.name, 'agent.sock')
+    x.cleanup()
+
+
+@pytest.fixture
+async def receiver(sock_path):
+    r = unix_receiver.Receiver('unix://' + sock_path)
+    await r.start()
+    yield r
+    await r.stop()
+
+
+@pytest.fixture
+async def sender():
+    s = unix_sender.Sender()
+    yield s
+    await s.close()
+
+
+def test_load():
+    assert isinstance(transports.load('unix:///tmp/x.sock', transports.SENDERS), unix_sender.Sender)
+    assert isinstance(transports.load('unix:///tmp/x.sock', transports.RECEIVERS), unix_receiver.Receiver)
+
+
+@pytest.mark.asyncio
+async def test_send_and_receive_in_order(receiver, sender):
+    await sender.send('first', receiver.endpoint)
+    await sender.send_batch([b'b%d' % i for i in range(50)], receiver.endpoint)
+    batch = []
+    while len(batch) < 51:
+        more = await receiver.receive_batch(100, timeout=2)
+        assert more
+        batch += more
+    assert [wc.plaintext for wc in batch] == ['first'] + ['b%d' % i for i in range(50)]
+    assert sender.connection_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_socket_is_replaced(sock_path, sender):
+    # Simulate a receiver that died without cleaning up.
+    s = socket.socket(socket.AF_UNIX)
+    s.bind(sock_path)
+    s.close()
+    assert os.path.exists(sock_path)
+    r = unix_receiver.Receiver('unix://' + sock_path)
+    await r.start()
+    await sender.send('hi', r.endpoint)
+    assert (await r.receive(timeout=2)).plaintext == 'hi'
+    await r.stop()
+    assert not os.path.exists(sock_path)
+
+
+@pytest.mark.asyncio
+async def test_live_socket_is_not_stolen(receiver, sender):
+    r = unix_receiver.Receiver(receiver.endpoint)
+    with pytest.raises(OSError):
+        await r.start()
+    # The first receiver still gets its messages.
+    await sender.send('hi', receiver.endpoint)
+    assert (await receiver.receive(timeout=2)).plaintext == 'hi'
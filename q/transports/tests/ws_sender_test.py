@@ -0,0 +1,89 @@
+import asyncio
+import random
+import pytest
+
+from .. import ws_receiver
+from .. import ws_sender
+
+
+async def _start_receiver(query=''):
+    for attempt in range(5):
+        r = ws_receiver.Receiver('ws://localhost:%d/agent%s' % (random.randint(10000, 65000), query))
+        try:
+            await r.start()
+            return r
+        except OSError:
+            pass
+    raise Exception("Couldn't find a free port.")
+
+
+@pytest.fixture
+async def receiver():
+    r = await _start_receiver()
+    yield r
+    await r.stop()
+
+
+@pytest.fixture
+async def sender():
+    s = ws_sender.Sender()
+    yield s
+    await s.close()
+
+
+def test_match():
+    assert ws_sender.match('ws://localhost:8080')
+    assert ws_sender.match('wss://example.com/agent')
+    assert not ws_sender.match('http://localhost:8080')
+    assert ws_receiver.match('ws://localhost:8080/agent?compress=1')
+    assert not ws_receiver.match('wss://localhost:8080')
+
+
+def test_compress_option():
+    for value in ['1', 't', 'True', 'yes', 'Y', 'on']:
+        assert ws_sender._split_uri('ws://x?compress=' + value)[1]
+        assert ws_receiver.Receiver('ws://localhost:8080?compress=' + value).compress
+    for value in ['0', '10', 'tfoo', 'yesterday', 'onion', 'off', '']:
+        assert not ws_sender._split_uri('ws://x?compress=' + value)[1]
+        assert not ws_receiver.Receiver('ws://localhost:8080?compress=' + value).compress
+    assert ws_sender._split_uri('ws://x/a?compress=0&compress=1') == ('ws://x/a', True)
+
+
+@pytest.mark.asyncio
+async def test_many_messages_one_connection(receiver, sender):
+    for i in range(5):
+        await sender.send('msg%d' % i, receiver.endpoint)
+    await sender.send_batch([b'b%d' % i for i in range(50)], receiver.endpoint)
+    batch = []
+    while len(batch) < 55:
+        more = await receiver.receive_batch(100, timeout=2)
+        assert more
+        batch += more
+    assert [wc.plaintext for wc in batch[:5]] == ['msg%d' % i for i in range(5)]
+    assert [wc.plaintext for wc in batch[5:]] == ['b%d' % i for i in range(50)]
+    assert sender.connection_count == 1
+    assert len(receiver.peers) == 1
+
+
+@pytest.mark.asyncio
+async def test_compressed():
+    receiver = await _start_receiver('?compress=1')
+    assert receiver.compress
+    try:
+        async with ws_sender.Sender() as sender:
+            await sender.send('x' * 100000, receiver.endpoint + '?compress=1')
+            wc = await receiver.receive(timeout=2)
+            assert wc.plaintext == 'x' * 100000
+    finally:
+        await receiver.stop()
+
+
+@pytest.mark.asyncio
+async def test_sender_reconnects(receiver, sender):
+    await sender.send('one', receiver.endpoint)
+    assert (await receiver.receive(timeout=2)).plaintext == 'one'
+    await receiver.stop()
+    await receiver.start()
+    await asyncio.sleep(0.05)
+    await sender.send('two', receiver.endpoint)
+    assert (await receiver.receive(timeout=2)).plaintext == 'two'
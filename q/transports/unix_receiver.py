@@ -0,0 +1,67 @@
+import asyncio
+import errno
+import os
+import re
+import socket
+import stat
+
+from . import framing
+from . import tcp_socket_receiver
+
+_PAT = re.compile('^unix://(.+)$')
+EXAMPLES = 'unix:///tmp/myagent.sock'
+
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+class Receiver(tcp_socket_receiver.Receiver):
+    """
+    Listen on a unix domain socket for length-prefixed messages (see
+    framing.py). This works just like tcp_socket_receiver.Receiver, but
+    skips the TCP stack--handy for hops between agents on the same host.
+    """
+
+    def __init__(self, uri, max_queue=tcp_socket_receiver.DEFAULT_MAX_QUEUE, max_size=framing.MAX_MESSAGE_SIZE):
+        """
+        :param uri: Like unix:///tmp/myagent.sock.
+        """
+        self.path = _PAT.match(uri).group(1)
+        self.endpoint = 'unix://' + self.path
+        self._init_queue(max_queue, max_size)
+
+    @property
+    def port(self):
+        return None
+
+    def _remove_stale_socket(self):
+        """
+        Remove a socket file left by a receiver that died, which would make
+        bind() fail. Raise OSError(EADDRINUSE) if something is still listening
+        on it; that socket isn't ours to take.
+        """
+        try:
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                return
+        except FileNotFoundError:
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(1)
+            try:
+                s.connect(self.path)
+            except ConnectionRefusedError:
+                os.unlink(self.path)
+                return
+            except FileNotFoundError:
+                return
+        raise OSError(errno.EADDRINUSE, 'Something is already listening on %s' % self.path)
+
+    async def _start_server(self):
+        self._remove_stale_socket()
+        return await asyncio.start_unix_server(self._handle_connection, self.path)
+
+    async def stop(self):
+        if self._server:
+            await super().stop()
+            self._remove_stale_socket()
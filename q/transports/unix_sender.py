@@ -0,0 +1,24 @@
+import asyncio
+import re
+
+from . import tcp_socket_sender
+
+EXAMPLES = 'unix:///tmp/myagent.sock'
+_PAT = re.compile('^unix://(.+)$')
+
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+class Sender(tcp_socket_sender.Sender):
+    """
+    Send length-prefixed messages (see framing.py) over unix domain sockets,
+    keeping one long-lived connection per socket path.
+    """
+
+    def _key_for(self, uri):
+        return (_PAT.match(uri).group(1),)
+
+    async def _connect(self, path):
+        return await asyncio.open_unix_connection(path)
@@ -0,0 +1,16 @@
+"""
+Query-string options shared by the ws:// sender and receiver.
+"""
+import re
+
+# The whole value must match, so compress=10 or compress=tfoo is not a yes.
+TRUE_PAT = re.compile('(?i)(1|t(rue)?|y(es)?|on)$')
+
+
+def compress_requested(params):
+    """
+    Return True if a query string parsed by urllib.parse.parse_qs asks for
+    compression. The last compress= value wins.
+    """
+    values = params.get('compress')
+    return bool(values and TRUE_PAT.match(values[-1]))
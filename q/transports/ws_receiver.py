@@ -0,0 +1,91 @@
+from aiohttp import web, WSMsgType
+import logging
+import re
+import urllib.parse
+
+from .. import mwc
+from .ingress_queue import QueuedReceiver
+from .ws_options import compress_requested
+
+_PAT = re.compile('^ws://([^:/?]+):([0-9]{1,5})(/[^?]*)?(?:[?](.*))?$')
+EXAMPLES = 'ws://localhost:8080|ws://localhost:8080/agent?compress=1'
+DEFAULT_MAX_QUEUE = 1000
+
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+class Receiver(QueuedReceiver):
+    """
+    Accept WebSocket connections from peers, and deliver the messages that
+    arrive over them in order. Each peer (see ws_sender.Sender) keeps its
+    connection open and sends every message over it, so there is no per-message
+    handshake. Binary and text frames are both accepted.
+    """
+
+    def __init__(self, uri, max_queue=None, compress=None):
+        """
+        :param uri: Where to listen, like ws://localhost:8080/agent. The query
+          string can set max_queue and compress (per-message deflate), as in
+          ws://localhost:8080?max_queue=100&compress=1.
+        :param max_queue: How many received messages to hold for the consumer.
+          When this many are waiting, we stop reading from peers until the
+          consumer catches up.
+        :param compress: Whether to offer per-message deflate to peers.
+        """
+        m = _PAT.match(uri)
+        if m.group(1) not in ['localhost', '127.0.0.1']:
+            raise ValueError('Can only listen on localhost or 127.0.0.1.')
+        self.host = m.group(1)
+        self.port = int(m.group(2))
+        self.path = m.group(3) or '/'
+        params = urllib.parse.parse_qs(m.group(4) or '')
+        if max_queue is None:
+            max_queue = int(params.get('max_queue', [DEFAULT_MAX_QUEUE])[-1])
+        if compress is None:
+            compress = compress_requested(params)
+        self.max_queue = max_queue
+        self.compress = compress
+        self._init_ingress(max_queue)
+        self.peers = set()
+        self.web_server = None
+        self.endpoint = 'ws://%s:%d%s' % (self.host, self.port, self.path)
+
+    async def accept(self, request):
+        ws = web.WebSocketResponse(compress=self.compress, max_msg_size=mwc.MAX_MESSAGE_SIZE)
+        await ws.prepare(request)
+        self.peers.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type in (WSMsgType.BINARY, WSMsgType.TEXT):
+                    await self._enqueue(mwc.MessageWithContext(msg.data))
+                elif msg.type == WSMsgType.ERROR:
+                    logging.warning('WebSocket connection closed with %s' % ws.exception())
+        finally:
+            self.peers.discard(ws)
+        return ws
+
+    async def start(self):
+        if not self.web_server:
+            app = web.Application()
+            app.add_routes([web.get(self.path, self.accept)])
+            self.web_server = web.AppRunner(app)
+            await self.web_server.setup()
+            site = web.TCPSite(self.web_server, self.host, self.port)
+            await site.start()
+
+    async def stop(self):
+        if self.web_server:
+            web_server = self.web_server
+            self.web_server = None
+            for ws in list(self.peers):
+                await ws.close()
+            await web_server.cleanup()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
@@ -0,0 +1,106 @@
+import aiohttp
+import asyncio
+import re
+import urllib.parse
+
+from .. import mwc
+from ..message_body import as_bytes
+from .ws_options import compress_requested
+
+EXAMPLES = 'ws://localhost:8080|wss://x.com/agent?compress=1'
+_PAT = re.compile('^wss?://[^/?]+.*$')
+DEFAULT_HEARTBEAT = 30
+
+
+def match(uri):
+    return bool(_PAT.match(uri))
+
+
+def _split_uri(uri):
+    """Return (uri without query string, whether the uri asks for compression)."""
+    url, _, query = uri.partition('?')
+    return url, compress_requested(urllib.parse.parse_qs(query))
+
+
+class Sender:
+    """
+    Send messages over WebSockets, keeping one long-lived connection per peer
+    and sending every message to that peer over it. Call close() when finished,
+    or use the sender as an async context manager.
+    """
+
+    def __init__(self, compress=False, heartbeat=DEFAULT_HEARTBEAT):
+        """
+        :param compress: Whether to ask peers for per-message deflate. A uri
+          can also ask for it with ?compress=1.
+        :param heartbeat: Seconds between pings that keep idle connections
+          (and the NAT mappings along the way) alive.
+        """
+        self.compress = compress
+        self.heartbeat = heartbeat
+        self._session = None
+        self._conns = {}
+        self._locks = {}
+
+    async def _ws_for(self, uri):
+        url, compress = _split_uri(uri)
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            ws = self._conns.get(url)
+            if ws is None or ws.closed:
+                if self._session is None:
+                    self._session = aiohttp.ClientSession()
+                ws = await self._session.ws_connect(
+                    url, compress=15 if (compress or self.compress) else 0,
+                    heartbeat=self.heartbeat, max_msg_size=mwc.MAX_MESSAGE_SIZE)
+                self._conns[url] = ws
+        return url, ws
+
+    async def _send_all(self, payloads, uri):
+        # If the connection has gone stale, reconnect once and try again,
+        # resuming with the first payload that didn't go out.
+        sent = 0
+        for attempt in range(2):
+            url, ws = await self._ws_for(uri)
+            try:
+                for payload in payloads[sent:]:
+                    if isinstance(payload, str):
+                        await ws.send_str(payload)
+                    else:
+                        await ws.send_bytes(as_bytes(payload))
+                    sent += 1
+                return
+            except (ConnectionError, aiohttp.ClientError):
+                if self._conns.get(url) is ws:
+                    del self._conns[url]
+                await ws.close()
+                if attempt:
+                    raise
+
+    async def send(self, payload, uri, *args):
+        await self._send_all([payload], uri)
+
+    async def send_batch(self, payloads, uri, *args):
+        """Send each payload to uri over the peer's connection."""
+        await self._send_all(list(payloads), uri)
+        return [None] * len(payloads)
+
+    @property
+    def connection_count(self):
+        return len(self._conns)
+
+    async def close(self):
+        conns = list(self._conns.values())
+        self._conns.clear()
+        for ws in conns:
+            await ws.close()
+        if self._session is not None:
+            session = self._session
+            self._session = None
+            await session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()